@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import networkx as nx
+
+from context_ranker import ContextRanker, TOP_N, RESTART
+from graph_traversal import get_pedagogical_subgraph
+from ingest_config import GRAPH_PATH
+
+# --- CONFIGURATION ---
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+NUM_QUERIES = 100
+TRAVERSAL_QUERIES = 10      # The traversal can visit the whole graph, so it gets fewer queries
+EXACT_QUERIES = 20          # Queries checked against PageRank computed by full power iteration
+EXACT_ITERATIONS = 60
+ATTACHMENT_EDGES = 2        # Barabasi-Albert edges per new node: hub-heavy like the real graph
+SEED = 42
+
+# Relationship mix and weight range of knowledge_graph_classified.graphml
+TYPE_SHARES = {"PREREQUISITE": 0.64, "COMPONENT": 0.20, "EVIDENCE": 0.09, "ANALOGY": 0.07}
+WEIGHT_RANGE = (4, 20)
+
+
+def synthetic_graph(size, seed=SEED):
+    """Scale-free graph with typed, weighted edges."""
+    rng = np.random.default_rng(seed)
+    G = nx.barabasi_albert_graph(size, ATTACHMENT_EDGES, seed=seed)
+    types = rng.choice(list(TYPE_SHARES), G.number_of_edges(), p=list(TYPE_SHARES.values()))
+    weights = rng.integers(*WEIGHT_RANGE, G.number_of_edges())
+    for (u, v), rtype, weight in zip(G.edges(), types, weights):
+        G[u][v]["relationship_type"] = str(rtype)
+        G[u][v]["weight"] = float(weight)
+    return G
+
+
+def latency_stats(latencies):
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def run_selection(select, targets):
+    latencies, sizes = [], []
+    for target in targets:
+        start = time.perf_counter()
+        context_nodes = select(target)[0]
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(context_nodes))
+    stats = latency_stats(latencies)
+    stats["mean_nodes"] = round(float(np.mean(sizes)), 1)
+    stats["max_nodes"] = int(max(sizes))
+    return stats
+
+
+def exact_recall(ranker, targets, top_n=TOP_N):
+    """
+    Share of the exact top_n PageRank nodes the ranker returns. Nodes tied with
+    the n-th exact score count as hits; seeds with fewer reachable nodes only
+    need those.
+    """
+    recalls = []
+    for target in targets:
+        seed = np.zeros(len(ranker))
+        seed[ranker.position[target]] = 1.0
+        exact = seed.copy()
+        for _ in range(EXACT_ITERATIONS):
+            exact = (1 - RESTART) * (ranker.transition @ exact) + RESTART * seed
+        exact[ranker.position[target]] = 0.0
+
+        relevant = min(top_n, int((exact > 0).sum()))
+        if relevant == 0:
+            continue
+        kth = np.sort(exact)[-top_n]
+        hits = sum(1 for node, _ in ranker.top_nodes([target], top_n)
+                   if exact[ranker.position[node]] > 0 and exact[ranker.position[node]] >= kth - 1e-12)
+        recalls.append(min(hits, relevant) / relevant)
+    return round(float(np.mean(recalls)), 4) if recalls else None
+
+
+def benchmark_graph(name, G, args):
+    print(f"\n=== {name}: {G.number_of_nodes():,} nodes, {G.number_of_edges():,} edges ===")
+    start = time.perf_counter()
+    ranker = ContextRanker(G)
+    build_secs = time.perf_counter() - start
+
+    rng = np.random.default_rng(SEED)
+    nodes = list(G.nodes())
+    targets = [nodes[i] for i in rng.choice(len(nodes), args.queries)]
+    result = {
+        "graph": name,
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "matrix_build_secs": round(build_secs, 2),
+        "matrix_mb": round(ranker.memory_bytes() / 1e6, 2),
+        "methods": {
+            "traversal": run_selection(lambda t: get_pedagogical_subgraph(G, t), targets[:args.traversal_queries]),
+            "pagerank": run_selection(ranker.get_pedagogical_subgraph, targets),
+        },
+    }
+    result["methods"]["pagerank"][f"recall_at_{TOP_N}"] = exact_recall(ranker, targets[:EXACT_QUERIES])
+
+    print(f"  matrix: built in {result['matrix_build_secs']}s, {result['matrix_mb']} MB")
+    for method, stats in result["methods"].items():
+        print(f"  {method:<10} p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms  "
+              f"nodes mean {stats['mean_nodes']:>9} max {stats['max_nodes']:>8}")
+    print(f"  pagerank recall@{TOP_N} vs. exact PageRank: {result['methods']['pagerank'][f'recall_at_{TOP_N}']}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark context selection: neighbour-rule traversal vs. personalized PageRank.")
+    parser.add_argument("--graph", default=GRAPH_PATH, help="Real graph benchmarked first ('' to skip)")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="Synthetic graph sizes")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--traversal-queries", type=int, default=TRAVERSAL_QUERIES)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if args.graph:
+        results.append(benchmark_graph(os.path.basename(args.graph), nx.read_graphml(args.graph), args))
+    for size in args.sizes:
+        results.append(benchmark_graph(f"synthetic-{size}", synthetic_graph(size), args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
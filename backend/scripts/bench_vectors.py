@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import time
+import argparse
+
+import numpy as np
+import sqlite_vec
+
+from ingest_config import DATA_DIR
+from init_database import SCHEMA, connect
+
+# --- CONFIGURATION ---
+SCRATCH_DB_PATH = os.path.join(DATA_DIR, "vector_bench.db")
+
+DIM = int(re.search(r"FLOAT\[(\d+)\]", SCHEMA).group(1)) # Embedding size of the real documents table
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+NUM_QUERIES = 100
+TOP_K = 10
+NUM_PARTITIONS = 10         # Rows are spread round-robin over this many courses (course_id partitions)
+INSERT_BATCH_SIZE = 2000
+NUM_TOPICS = 500            # Synthetic vectors are clustered around topics, like real chunk embeddings
+TOPIC_NOISE = 0.6           # Spread of a chunk around its topic (relative to the topic vector)
+CHUNK_TEXT_CHARS = 800      # Stored text per row, so the database size is realistic
+SEED = 42
+
+# hnswlib parameters
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Brute-force cosine scan (what user_input.get_top_chunks did before partitioning)
+FULL_SCAN_QUERY = """
+    SELECT id, vec_distance_cosine(embedding, ?) AS score
+    FROM documents
+    ORDER BY score ASC
+    LIMIT ?;
+"""
+
+KNN_QUERY = """
+    SELECT id, distance
+    FROM documents
+    WHERE embedding MATCH ? AND k = ?
+    ORDER BY distance;
+"""
+
+# Same query as user_input.get_top_chunks for one course: only that partition is scanned
+SCOPED_KNN_QUERY = """
+    SELECT id, distance
+    FROM documents
+    WHERE embedding MATCH ? AND k = ? AND course_id = ?
+    ORDER BY distance;
+"""
+
+
+# --- SYNTHETIC DATA ---
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_topics(dim=DIM, seed=SEED):
+    return normalize(np.random.default_rng(seed).standard_normal((NUM_TOPICS, dim)).astype(np.float32))
+
+
+def make_vectors(topics, count, seed):
+    """Unit vectors scattered around random topics (deterministic for a given seed)."""
+    rng = np.random.default_rng(seed)
+    centers = topics[rng.integers(0, len(topics), count)]
+    noise = rng.standard_normal(centers.shape).astype(np.float32) * (TOPIC_NOISE / np.sqrt(topics.shape[1]))
+    return normalize(centers + noise)
+
+
+def iter_batches(topics, size):
+    """(first_id, vectors) batches of the corpus; ids start at 1 like SQLite rowids."""
+    for batch_no, start in enumerate(range(0, size, INSERT_BATCH_SIZE)):
+        count = min(INSERT_BATCH_SIZE, size - start)
+        yield start + 1, make_vectors(topics, count, SEED + 1 + batch_no)
+
+
+# --- EXACT GROUND TRUTH ---
+class ExactTopK:
+    """
+    Running exact top-k (cosine) of every query over the corpus, fed batch by batch
+    so the corpus never has to be in memory at once.
+    """
+
+    def __init__(self, queries, k):
+        self.queries = queries
+        self.k = k
+        self.best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        self.best_sims = np.zeros((len(queries), 0), dtype=np.float32)
+
+    def add(self, ids, vectors):
+        if len(ids) == 0:
+            return
+        sims = self.queries @ vectors.T
+        ids = np.broadcast_to(ids, sims.shape)
+        all_sims = np.hstack([self.best_sims, sims])
+        all_ids = np.hstack([self.best_ids, ids])
+        keep = np.argsort(-all_sims, axis=1)[:, :self.k]
+        self.best_sims = np.take_along_axis(all_sims, keep, axis=1)
+        self.best_ids = np.take_along_axis(all_ids, keep, axis=1)
+
+    def results(self):
+        return [set(row) for row in self.best_ids.tolist()]
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & t) / len(t) for f, t in zip(found, truth)]))
+
+
+def latency_stats(latencies):
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+# --- BACKENDS ---
+def course_of(row_ids, partitions):
+    return (np.asarray(row_ids) - 1) % partitions
+
+
+def run_sql_queries(conn, sql, queries, k, *extra):
+    found, latencies = [], []
+    for query in queries:
+        blob = sqlite_vec.serialize_float32(query.tolist())
+        start = time.perf_counter()
+        rows = conn.execute(sql, (blob, k) + extra).fetchall()
+        latencies.append(time.perf_counter() - start)
+        found.append([row[0] for row in rows])
+    return found, latencies
+
+
+def new_hnsw_index(size, dim):
+    import hnswlib
+
+    index = hnswlib.Index(space="cosine", dim=dim)
+    index.init_index(max_elements=size, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+    return index
+
+
+def run_hnsw_queries(index, queries, k, ef):
+    index.set_ef(max(ef, k))
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        labels, _ = index.knn_query(query, k=k)
+        latencies.append(time.perf_counter() - start)
+        found.append(labels[0].tolist())
+    return found, latencies
+
+
+# --- BENCHMARK ---
+def benchmark_size(size, args, topics, queries):
+    print(f"\n=== {size:,} rows ===")
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    conn = connect(args.db)
+    conn.executescript(SCHEMA) # The real table (init_database.py), so the benchmark cannot drift from it
+
+    truth = ExactTopK(queries, args.k)
+    scoped_truth = ExactTopK(queries, args.k) # Ground truth within partition course-0
+    hnsw = None if args.skip_hnsw else new_hnsw_index(size, topics.shape[1])
+    filler = "x" * CHUNK_TEXT_CHARS
+    insert_secs = hnsw_build_secs = 0.0
+
+    for first_id, vectors in iter_batches(topics, size):
+        ids = np.arange(first_id, first_id + len(vectors))
+        courses = course_of(ids, args.partitions)
+        rows = [(int(row_id), f"course-{course}", f"https://example.com/page/{row_id // 20}", int(row_id % 20),
+                 filler, sqlite_vec.serialize_float32(v.tolist())) for row_id, course, v in zip(ids, courses, vectors)]
+        start = time.perf_counter()
+        conn.executemany("""
+            INSERT INTO documents (id, course_id, source, chunk_index, chunk_text, embedding)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        insert_secs += time.perf_counter() - start
+
+        if hnsw is not None:
+            start = time.perf_counter()
+            hnsw.add_items(vectors, ids)
+            hnsw_build_secs += time.perf_counter() - start
+
+        truth.add(ids, vectors)
+        scoped_truth.add(ids[courses == 0], vectors[courses == 0])
+        print(f"  inserted {first_id + len(vectors) - 1:,}/{size:,}", end="\r")
+
+    conn.execute("VACUUM")
+    result = {
+        "rows": size,
+        "insert_rows_per_sec": round(size / insert_secs, 1),
+        "db_size_mb": round(os.path.getsize(args.db) / 1e6, 1),
+        "methods": {},
+    }
+    print(f"  insert: {result['insert_rows_per_sec']:,} rows/s, db size: {result['db_size_mb']:,} MB")
+
+    expected, scoped_expected = truth.results(), scoped_truth.results()
+    methods = [("full_scan", expected, lambda: run_sql_queries(conn, FULL_SCAN_QUERY, queries, args.k)),
+               ("vec0_knn", expected, lambda: run_sql_queries(conn, KNN_QUERY, queries, args.k)),
+               ("vec0_scoped", scoped_expected,
+                lambda: run_sql_queries(conn, SCOPED_KNN_QUERY, queries, args.k, "course-0"))]
+    if hnsw is not None:
+        methods.append(("hnswlib", expected, lambda: run_hnsw_queries(hnsw, queries, args.k, args.ef)))
+
+    for name, method_expected, run in methods:
+        found, latencies = run()
+        stats = latency_stats(latencies)
+        stats[f"recall_at_{args.k}"] = round(recall_at_k(found, method_expected), 4)
+        if name == "hnswlib":
+            stats["build_secs"] = round(hnsw_build_secs, 2)
+        result["methods"][name] = stats
+        print(f"  {name:<10} p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  "
+              f"p99 {stats['p99_ms']:>9} ms  recall@{args.k} {stats[f'recall_at_{args.k}']}")
+
+    conn.close()
+    os.remove(args.db)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark vector retrieval (full scan, vec0 KNN, hnswlib) on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--partitions", type=int, default=NUM_PARTITIONS,
+                        help="Courses the rows are spread over; vec0_scoped searches one of them")
+    parser.add_argument("--ef", type=int, default=HNSW_EF_SEARCH, help="hnswlib search breadth (recall vs. latency)")
+    parser.add_argument("--dim", type=int, default=DIM)
+    parser.add_argument("--db", default=SCRATCH_DB_PATH, help="Scratch database (deleted after each size)")
+    parser.add_argument("--skip-hnsw", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.dim != DIM:
+        SCHEMA = SCHEMA.replace(f"FLOAT[{DIM}]", f"FLOAT[{args.dim}]")
+
+    topics = make_topics(args.dim)
+    # Queries come from the same distribution but are not corpus rows
+    queries = make_vectors(topics, args.queries, SEED)
+
+    results = [benchmark_size(size, args, topics, queries) for size in args.sizes]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
@@ -1,7 +1,9 @@
 import sqlite3
 import sqlite_vec
 
-DB_PATH = "backend/data/vector.db"
+from ingest_config import VECTOR_DB_PATH
+
+DB_PATH = VECTOR_DB_PATH
 
 conn = sqlite3.connect(DB_PATH)
 conn.enable_load_extension(True)
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+
+from ingest_config import WORKING_DIR
+
+# --- CONFIGURATION ---
+CHUNKS_JSON_NAME = "kv_store_text_chunks.json"
+CHUNKS_DB_NAME = "kv_store_text_chunks.db"
+
+INSERT_BATCH_SIZE = 1000
+SQL_VARIABLE_LIMIT = 500
+
+logger = logging.getLogger("erica.chunks")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    tokens INTEGER,
+    full_doc_id TEXT,
+    chunk_order_index INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(full_doc_id, chunk_order_index);
+"""
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_chunk_store(kv_path, db_path):
+    """Copies a GraphRAG text chunk KV store (chunk-<hash> -> record) into an indexed SQLite table."""
+    with open(kv_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.execute("DELETE FROM chunks")
+    rows = []
+    for chunk_id, record in records.items():
+        rows.append((chunk_id, record.get("content", ""), _int_or_none(record.get("tokens")),
+                     record.get("full_doc_id"), _int_or_none(record.get("chunk_order_index"))))
+        if len(rows) >= INSERT_BATCH_SIZE:
+            conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+            rows.clear()
+    conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return len(records)
+
+
+class ChunkStore:
+    """
+    Read side of the chunk store: each request reads only the chunk texts it
+    needs through the primary key index. Nothing is kept in memory.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def memory_bytes(self):
+        return 0
+
+    def get_texts(self, chunk_ids, limit=None):
+        """(chunk_id, text) of the first `limit` IDs that exist, in the given order."""
+        chunk_ids = list(chunk_ids)
+        found = []
+        for start in range(0, len(chunk_ids), SQL_VARIABLE_LIMIT):
+            batch = chunk_ids[start:start + SQL_VARIABLE_LIMIT]
+            marks = ",".join("?" * len(batch))
+            texts = dict(self.conn.execute(f"SELECT id, content FROM chunks WHERE id IN ({marks})", batch))
+            found.extend((chunk_id, texts[chunk_id]) for chunk_id in batch if chunk_id in texts)
+            if limit is not None and len(found) >= limit:
+                break
+        return found[:limit]
+
+
+class JsonChunks:
+    """The whole JSON KV store in memory; used when no chunk store has been built."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def memory_bytes(self):
+        return sum(sys.getsizeof(chunk_id) + sys.getsizeof(record.get("content", ""))
+                   for chunk_id, record in self.records.items())
+
+    def get_texts(self, chunk_ids, limit=None):
+        found = [(chunk_id, self.records[chunk_id]["content"]) for chunk_id in chunk_ids if chunk_id in self.records]
+        return found[:limit]
+
+
+def open_chunk_source(working_dir):
+    """
+    The SQLite chunk store of a GraphRAG working dir if it is up to date, else
+    its JSON KV store. A store older than the JSON misses the chunks of later
+    GraphRAG inserts, whose evidence IDs would silently resolve to nothing.
+    """
+    db_path = os.path.join(working_dir, CHUNKS_DB_NAME)
+    json_path = os.path.join(working_dir, CHUNKS_JSON_NAME)
+    if os.path.exists(db_path):
+        if not os.path.exists(json_path) or os.path.getmtime(db_path) >= os.path.getmtime(json_path):
+            return ChunkStore(db_path)
+        logger.warning("%s is older than %s; reading the JSON until chunk_store.py is re-run", db_path, json_path)
+
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            return JsonChunks(json.load(f))
+    return JsonChunks({})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the indexed chunk store from the GraphRAG text chunk KV store.")
+    parser.add_argument("--working-dir", default=WORKING_DIR)
+    args = parser.parse_args()
+
+    kv_path = os.path.join(args.working_dir, CHUNKS_JSON_NAME)
+    db_path = os.path.join(args.working_dir, CHUNKS_DB_NAME)
+    print(f"--- Loading {kv_path} into {db_path} ---")
+    count = build_chunk_store(kv_path, db_path)
+    print(f"Stored {count} chunks.")
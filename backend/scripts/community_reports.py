@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import asyncio
+import argparse
+from collections import defaultdict
+
+import networkx as nx
+from dotenv import load_dotenv
+
+from ingest_config import WORKING_DIR, count_tokens, default_graph_path
+
+# --- CONFIGURATION ---
+load_dotenv()
+MODEL_NAME = "gpt-4o-mini"
+
+REPORTS_PATH = os.path.join(WORKING_DIR, "kv_store_community_reports.json")
+
+MIN_COMMUNITY_SIZE = 3        # Smaller clusters are not worth a report
+MEMBERS_PER_REPORT = 15       # Most connected members given to the summarizer
+MAX_CONCURRENT_REQUESTS = 20
+MAX_REPORTS_PER_QUESTION = 4
+MIN_RELATIVE_SCORE = 0.5      # Reports scoring below this fraction of the best match are skipped
+
+# Phrases that mark a question as broad (served from community reports). "Tell me about X" and
+# "introduction to X" are left out: they usually ask about a single concept.
+BROAD_QUESTION_PATTERN = re.compile(
+    r"\b(overview|summar(y|ize|ise)|big picture|survey of|"
+    r"what (topics|concepts) (are|does)|main (ideas|topics|concepts))\b",
+    re.IGNORECASE
+)
+
+# Words that carry no topic (including the broad-question phrasing itself)
+STOP_WORDS = {"the", "of", "a", "an", "to", "me", "give", "what", "is", "are", "and", "in", "on",
+              "about", "tell", "overview", "summary", "summarize", "summarise", "introduction", "intro",
+              "big", "picture", "main", "ideas", "topics", "concepts", "survey", "does"}
+
+def clean_name(node):
+    return str(node).replace('"', "").strip()
+
+
+def first_statement(description):
+    """First <SEP> piece of a description, without the GraphRAG quotes."""
+    return str(description or "").split("<SEP>")[0].strip().strip('"')
+
+
+# --- OFFLINE BUILD ---
+def group_communities(G):
+    """Members of every (level, cluster) from the 'clusters' node attribute."""
+    communities = defaultdict(list)
+    for node, data in G.nodes(data=True):
+        try:
+            memberships = json.loads(data.get("clusters", "[]"))
+        except json.JSONDecodeError:
+            continue
+        for membership in memberships:
+            communities[(membership["level"], membership["cluster"])].append(node)
+    return communities
+
+
+def community_digest(G, members):
+    """Top members by degree with their descriptions, plus the edges among them."""
+    top = sorted(members, key=G.degree, reverse=True)[:MEMBERS_PER_REPORT]
+    top_set = set(top)
+    lines = [f"- {clean_name(n)}: {first_statement(G.nodes[n].get('description'))}" for n in top]
+    relations = []
+    for u, v, data in G.edges(top, data=True):
+        if v in top_set and u < v:
+            relations.append(f"- {clean_name(u)} --{data.get('relationship_type', 'RELATED')}--> {clean_name(v)}")
+    return top, "\n".join(lines), "\n".join(relations[:MEMBERS_PER_REPORT])
+
+
+def fallback_report(G, top):
+    """Deterministic report used without --llm (or when the API fails)."""
+    title = ", ".join(clean_name(n) for n in top[:3])
+    body = " ".join(first_statement(G.nodes[n].get("description")) for n in top[:5])
+    return title, body
+
+
+async def summarize_community_async(client, entities, relations, semaphore):
+    async with semaphore:
+        system_prompt = (
+            "You are an expert Curriculum Designer. "
+            "Write a short overview of the topic formed by the concepts below, for a student "
+            "who wants the big picture: what the topic is, its key concepts and how they build "
+            "on each other. At most 150 words. "
+            "Respond with valid JSON only: {\"title\": \"TOPIC TITLE\", \"summary\": \"...\"}"
+        )
+        user_message = f"Concepts:\n{entities}\n\nRelationships:\n{relations}"
+
+        for attempt in range(3):
+            try:
+                response = await client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    temperature=0.0,
+                    response_format={"type": "json_object"}
+                )
+                content = json.loads(response.choices[0].message.content)
+                return content.get("title", ""), content.get("summary", "")
+            except Exception:
+                await asyncio.sleep(2 * (attempt + 1))
+        return None
+
+
+async def summarize_communities(digests):
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    keys = list(digests)
+    tasks = [summarize_community_async(client, digests[k][1], digests[k][2], semaphore) for k in keys]
+    return dict(zip(keys, await asyncio.gather(*tasks)))
+
+
+def build_reports(G, use_llm=False):
+    """
+    One report per cluster, keyed by cluster id like nano-graphrag's community store.
+    Each report keeps its token count so the server can pack them into a budget.
+    """
+    communities = {k: v for k, v in group_communities(G).items() if len(v) >= MIN_COMMUNITY_SIZE}
+    digests = {key: community_digest(G, members) for key, members in communities.items()}
+
+    summaries = {}
+    if use_llm:
+        print(f"Summarizing {len(digests)} communities with {MODEL_NAME}...")
+        summaries = asyncio.run(summarize_communities(digests))
+
+    reports = {}
+    for (level, cluster), members in communities.items():
+        top = digests[(level, cluster)][0]
+        title, body = summaries.get((level, cluster)) or fallback_report(G, top)
+        report_string = f"# {title}\n\n{body}"
+        reports[str(cluster)] = {
+            "level": level,
+            "title": title,
+            "report_string": report_string,
+            "tokens": count_tokens(report_string),
+            "nodes": sorted(members),
+            "occurrence": len(members),
+        }
+    return reports
+
+
+# --- SERVING ---
+def load_reports(path=REPORTS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_broad_question(query):
+    return bool(BROAD_QUESTION_PATTERN.search(query))
+
+
+def is_cluster_title(reports, node):
+    """
+    Whether a concept names a whole cluster: it is a report title, or one of
+    the hub concepts an extractive title lists.
+    """
+    name = clean_name(node).lower()
+    return any(name in (part.strip().lower() for part in report["title"].split(","))
+               for report in reports.values())
+
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def select_reports(reports, query, max_tokens):
+    """
+    Ranks reports by how many query words appear in their title and member names,
+    preferring coarse (low level) communities on ties, and packs the best ones into
+    the token budget. A sub-community of an already selected report adds nothing
+    new and is skipped. Returns a list of reports, best first.
+    """
+    query_words = _words(query) - STOP_WORDS
+    if not query_words:
+        return []
+
+    scored = []
+    for report in reports.values():
+        title_hits = len(query_words & _words(report["title"]))
+        member_hits = sum(1 for node in report["nodes"] if _words(clean_name(node)) & query_words)
+        score = 3 * title_hits + member_hits / max(1, len(report["nodes"])) * 10
+        if score > 0:
+            scored.append((score, -report["level"], report))
+
+    if not scored:
+        return []
+    best = max(score for score, _, _ in scored)
+
+    selected, used = [], 0
+    for score, _, report in sorted(scored, key=lambda item: (item[0], item[1]), reverse=True):
+        if score < best * MIN_RELATIVE_SCORE or len(selected) >= MAX_REPORTS_PER_QUESTION:
+            break
+        members = set(report["nodes"])
+        if any(members <= set(other["nodes"]) for other in selected):
+            continue
+        if used + report["tokens"] > max_tokens:
+            continue
+        selected.append(report)
+        used += report["tokens"]
+    return selected
+
+
+def format_reports(reports):
+    lines = ["--- TOPIC OVERVIEWS (Community Summaries) ---"]
+    for report in reports:
+        lines.append(report["report_string"] + "\n")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build one summary per graph cluster.")
+    parser.add_argument("--input", default=default_graph_path())
+    parser.add_argument("--output", default=REPORTS_PATH)
+    parser.add_argument("--llm", action="store_true",
+                        help="Summarize each community with the LLM instead of the extractive fallback.")
+    args = parser.parse_args()
+
+    print(f"--- Loading Graph from {args.input} ---")
+    G = nx.read_graphml(args.input)
+
+    reports = build_reports(G, use_llm=args.llm)
+    total_tokens = sum(r["tokens"] for r in reports.values())
+    print(f"Built {len(reports)} community reports ({total_tokens} tokens total).")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(reports, f, ensure_ascii=False, indent=2)
+    print(f"Reports saved to: {args.output}")
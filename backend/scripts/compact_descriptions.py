@@ -0,0 +1,198 @@
+import re
+import asyncio
+import argparse
+from difflib import SequenceMatcher
+
+import networkx as nx
+from dotenv import load_dotenv
+
+from ingest_config import GRAPH_PATH, COMPACT_GRAPH_PATH, count_tokens
+
+# --- CONFIGURATION ---
+load_dotenv()
+MODEL_NAME = "gpt-4o-mini"
+
+INPUT_GRAPH_PATH = GRAPH_PATH
+OUTPUT_GRAPH_PATH = COMPACT_GRAPH_PATH
+
+SEP = "<SEP>"
+COVERED_THRESHOLD = 0.5      # Share of a statement's content words already in the kept ones at which it adds nothing
+SEQUENCE_THRESHOLD = 0.8     # Character similarity at which two statements are the same text
+MAX_KEPT_SENTENCES = 2       # Cap on distinct statements kept per node (--max-kept 0 keeps all)
+MAX_CONCURRENT_REQUESTS = 20
+
+# Function words: sharing them says nothing about two statements meaning the same
+STOP_WORDS = {"a", "an", "the", "of", "to", "in", "on", "for", "by", "with", "and", "or", "as", "at",
+              "from", "that", "which", "this", "it", "its", "is", "are", "was", "be", "used", "can"}
+
+def split_description(raw):
+    """
+    Splits a GraphRAG description ('"A"<SEP>"B"<SEP>...') into clean sentences.
+    Quotes around each piece are stripped, empty pieces are dropped.
+    """
+    parts = []
+    for piece in str(raw or "").split(SEP):
+        piece = piece.strip().strip('"').strip()
+        if piece:
+            parts.append(piece)
+    return parts
+
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9 ]", "", text.lower())
+
+
+def _content_words(text):
+    return set(_normalize(text).split()) - STOP_WORDS
+
+
+def is_similar(a, b):
+    """Two statements are the same text if their character sequence is mostly the same."""
+    return SequenceMatcher(None, _normalize(a), _normalize(b)).ratio() >= SEQUENCE_THRESHOLD
+
+
+def dedupe_sentences(parts):
+    """
+    Greedy coverage dedupe. Longer statements are considered first, so the most
+    complete phrasing of each idea survives. A statement is dropped when most of
+    its content words were already said by the kept ones: GraphRAG paraphrases
+    ("X is a statistical method for ...") rarely share a whole phrasing with one
+    statement, but are covered by the statements kept before them.
+    """
+    kept = []
+    covered = set()
+    for part in sorted(parts, key=len, reverse=True):
+        words = _content_words(part)
+        if kept and words and len(words & covered) / len(words) >= COVERED_THRESHOLD:
+            continue
+        if any(is_similar(part, existing) for existing in kept):
+            continue
+        kept.append(part)
+        covered |= words
+    return kept
+
+
+async def summarize_async(client, node, parts, semaphore):
+    """
+    Optional offline pass: merge the distinct statements into one definition.
+    Returns None if every attempt failed.
+    """
+    async with semaphore:
+        system_prompt = (
+            "You are an expert Curriculum Designer. "
+            "Merge the statements below into ONE concise, pedagogical definition of the concept "
+            "(at most 3 sentences). Do not add facts that are not in the statements."
+        )
+        user_message = f"Concept: {node}\nStatements:\n" + "\n".join(f"- {p}" for p in parts)
+
+        for attempt in range(3):
+            try:
+                response = await client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    temperature=0.0,
+                    max_tokens=200
+                )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                error = e
+                await asyncio.sleep(2 * (attempt + 1))
+
+        print(f"Summarizing {node} failed after 3 attempts: {type(error).__name__}: {error}")
+        return None
+
+
+async def summarize_graph(nodes_parts):
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    nodes = list(nodes_parts)
+    tasks = [summarize_async(client, node, nodes_parts[node], semaphore) for node in nodes]
+    results = await asyncio.gather(*tasks)
+    return dict(zip(nodes, results))
+
+
+def compact_graph(G, summarize=False, max_kept=MAX_KEPT_SENTENCES):
+    """
+    Rewrites every node 'description' in place as one canonical description and
+    stores its token count under 'description_tokens'. Without summarization the
+    distinct statements are joined; max_kept drops all but the longest ones.
+    Returns (tokens_before, tokens_after, multi_before, multi_after), the last two
+    over the nodes with several statements (the only ones dedupe can shrink).
+    """
+    tokens_before = tokens_after = 0
+    multi_before = multi_after = 0
+    multi_nodes = set()
+    to_summarize = {}
+    truncated = 0
+
+    for node, data in G.nodes(data=True):
+        raw = data.get("description", "")
+        raw_tokens = count_tokens(raw)
+        tokens_before += raw_tokens
+
+        parts = split_description(raw)
+        if len(parts) > 1:
+            multi_nodes.add(node)
+            multi_before += raw_tokens
+        kept = dedupe_sentences(parts)
+        if max_kept and len(kept) > max_kept:
+            truncated += 1
+        data["description"] = " ".join(kept[:max_kept] if max_kept else kept)
+
+        # Only nodes that still have several distinct statements benefit from an LLM merge
+        if summarize and len(kept) > 1:
+            to_summarize[node] = kept
+
+    if to_summarize:
+        print(f"Summarizing {len(to_summarize)} multi-statement descriptions with {MODEL_NAME}...")
+        summaries = asyncio.run(summarize_graph(to_summarize))
+        failed = 0
+        for node, summary in summaries.items():
+            if summary is None:
+                failed += 1 # Keeps the deduplicated statements
+            else:
+                G.nodes[node]["description"] = summary
+        if failed:
+            print(f"WARNING: {failed} of {len(summaries)} summaries failed; those nodes keep their deduplicated statements.")
+
+    if truncated and not summarize:
+        print(f"Kept at most {max_kept} statements per node: {truncated} nodes capped (--max-kept 0 keeps all).")
+
+    for node, data in G.nodes(data=True):
+        data["description_tokens"] = count_tokens(data["description"])
+        tokens_after += data["description_tokens"]
+        if node in multi_nodes:
+            multi_after += data["description_tokens"]
+
+    return tokens_before, tokens_after, multi_before, multi_after
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dedupe and merge <SEP>-joined node descriptions.")
+    parser.add_argument("--input", default=INPUT_GRAPH_PATH)
+    parser.add_argument("--output", default=OUTPUT_GRAPH_PATH)
+    parser.add_argument("--summarize", action="store_true",
+                        help="Run one offline LLM pass to merge the remaining distinct statements.")
+    parser.add_argument("--max-kept", type=int, default=MAX_KEPT_SENTENCES,
+                        help=f"Keep only the N longest distinct statements per node (default: {MAX_KEPT_SENTENCES}, 0 keeps all)")
+    args = parser.parse_args()
+
+    print(f"--- Loading Graph from {args.input} ---")
+    G = nx.read_graphml(args.input)
+
+    before, after, multi_before, multi_after = compact_graph(G, summarize=args.summarize, max_kept=args.max_kept)
+    saved = 100 * (1 - after / before) if before else 0
+    print(f"Description tokens: {before} -> {after} ({saved:.1f}% smaller)")
+    if multi_before:
+        multi_saved = 100 * (1 - multi_after / multi_before)
+        print(f"  nodes with several statements: {multi_before} -> {multi_after} ({multi_saved:.1f}% smaller); "
+              f"single statements only shrink with --summarize")
+
+    nx.write_graphml(G, args.output)
+    print(f"Graph saved to: {args.output}")
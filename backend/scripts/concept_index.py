@@ -0,0 +1,240 @@
+import re
+from collections import defaultdict, Counter
+
+# --- CONFIGURATION ---
+MAX_NAME_WORDS = 6         # Longest query word window compared against node names
+MIN_WORD_LENGTH = 6        # Shorter query words are never treated as typos (TELL -> CELL, MAKE -> MAZE)
+MAX_EDIT_RATIO = 1 / 6     # Allowed typos (edits) per character of a word: 1 from 6 letters, 2 from 12
+MIN_SINGLE_WORD_CORRECTION = 8 # A corrected word alone may only name a concept from this length on
+MIN_JOINED_WORD_LENGTH = 4 # Query words joined into another name's word ("BACK PROPAGATION") need this length
+CORRECTION_CACHE_SIZE = 10000 # Query words repeat a lot ("EXPLAIN", "WHAT"), so corrections are cached
+
+# Everyday and classroom words that are never corrected into concept names (PROFESSOR -> PROCESSOR)
+COMMON_WORDS = {
+    "ABOUT", "ACTUALLY", "ANSWER", "ANYTHING", "ASSIGNMENT", "BECAUSE", "BETWEEN", "CHAPTER", "CLASS",
+    "COURSE", "DESCRIBE", "DIFFERENCE", "DIFFERENT", "EXAMPLE", "EXAMPLES", "EXPLAIN", "HOMEWORK",
+    "INSTRUCTOR", "LECTURE", "LECTURES", "PLEASE", "PROBLEM", "PROBLEMS", "PROFESSOR", "QUESTION",
+    "QUESTIONS", "REALLY", "SHOULD", "SOMETHING", "STUDENT", "STUDENTS", "STUDYING", "TEACHER",
+    "THROUGH", "TODAY", "TOMORROW", "UNDERSTAND", "WEATHER", "WITHOUT", "YESTERDAY",
+}
+
+
+def normalize_words(text):
+    """Upper-cased words without quotes or punctuation."""
+    return re.findall(r"[A-Z0-9]+", str(text).upper().replace('"', "").replace("'", ""))
+
+
+def name_key(text):
+    """Space-insensitive key, so 'BACK PROPAGATION' and 'BACKPROPAGATION' share one key."""
+    return "".join(normalize_words(text))
+
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance_within(a, b, max_edits):
+    """
+    Optimal string alignment distance (insert/delete/substitute/transpose) if it is
+    at most max_edits, else None. Bit-parallel (Myers' algorithm with Hyyro's
+    transposition term): bit i of each vector is row i of the current DP column,
+    so a whole column costs a handful of integer operations. Stops once the
+    remaining characters can no longer bring the distance within the bound.
+    """
+    if abs(len(a) - len(b)) > max_edits:
+        return None
+    if not a:
+        return len(b)
+    mask = (1 << len(a)) - 1
+    last_row = 1 << (len(a) - 1)
+    positions = {} # character -> bitmask of its positions in a
+    for i, char in enumerate(a):
+        positions[char] = positions.get(char, 0) | (1 << i)
+
+    vertical_pos, vertical_neg, diagonal_zero, previous_match = mask, 0, 0, 0
+    distance = len(a)
+    for j, char in enumerate(b):
+        match = positions.get(char, 0)
+        transposed = (((~diagonal_zero) & match) << 1) & previous_match
+        diagonal_zero = ((((match & vertical_pos) + vertical_pos) ^ vertical_pos)
+                         | match | vertical_neg | transposed) & mask
+        horizontal_pos = (vertical_neg | ~(diagonal_zero | vertical_pos)) & mask
+        horizontal_neg = diagonal_zero & vertical_pos
+        if horizontal_pos & last_row:
+            distance += 1
+        elif horizontal_neg & last_row:
+            distance -= 1
+        if distance - (len(b) - j - 1) > max_edits:
+            return None
+        horizontal_pos = ((horizontal_pos << 1) | 1) & mask
+        horizontal_neg = (horizontal_neg << 1) & mask
+        vertical_pos = (horizontal_neg | ~(diagonal_zero | horizontal_pos)) & mask
+        vertical_neg = diagonal_zero & horizontal_pos
+        previous_match = match
+    return distance if distance <= max_edits else None
+
+
+class ConceptIndex:
+    """
+    Typo-tolerant concept lookup, built once at graph load.
+
+    Node names are normalized to space-insensitive keys (hash map for exact
+    matches), and the words of all names go into a character trigram inverted
+    index. A query word that is not a known name word is corrected through
+    that index: candidate generation reads only the postings of its rarest
+    trigrams, and only those candidates get the bounded edit-distance check.
+    Nothing ever scans every node.
+    """
+
+    def __init__(self, nodes):
+        self.by_key = {}
+        self.word_counts = Counter()
+        self.postings = defaultdict(list) # trigram -> name words containing it
+        self.keys_by_word = defaultdict(list) # name word -> keys of the names using it
+        self.corrections = {}
+
+        for node in nodes:
+            words = normalize_words(node)
+            key = "".join(words)
+            if not key:
+                continue
+            # Several nodes can normalize to the same key; keep the longest (most specific) id
+            if key not in self.by_key or len(str(node)) > len(str(self.by_key[key])):
+                self.by_key[key] = node
+            for word in set(words):
+                self.keys_by_word[word].append(key)
+            for word in words:
+                if word not in self.word_counts:
+                    for gram in trigrams(word):
+                        self.postings[gram].append(word)
+                self.word_counts[word] += 1
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def correct_word(self, word):
+        """Closest name word within the edit budget (ties -> most common), or None."""
+        if word in self.corrections:
+            return self.corrections[word]
+        if len(self.corrections) >= CORRECTION_CACHE_SIZE:
+            self.corrections.clear()
+
+        max_edits = int(len(word) * MAX_EDIT_RATIO)
+        if max_edits == 0:
+            self.corrections[word] = None
+            return None
+        grams = trigrams(word)
+
+        # q-gram lemma: each edit destroys at most 4 trigrams (a transposition touches
+        # two characters), so a word within max_edits shares one of the
+        # (4 * max_edits + 1) rarest trigrams of the query word
+        rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:4 * max_edits + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        # Cheap filters before the edit-distance check: the length differs by at most one
+        # per edit, and a word within the bound still contains all but 4 per edit of the
+        # query's trigrams (substring tests run in C, the distance check in Python).
+        # Once a match is found, no candidate needs more edits than it (ties still count).
+        best = None
+        bound = max_edits
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > bound:
+                continue
+            padded = f"${candidate}$"
+            shared = 0
+            for gram in grams:
+                if gram in padded:
+                    shared += 1
+            if shared < len(grams) - 4 * bound:
+                continue
+            edits = edit_distance_within(word, candidate, bound)
+            if edits is None:
+                continue
+            rank = (edits, -self.word_counts[candidate])
+            if best is None or rank < best[0]:
+                best = (rank, candidate)
+                bound = edits
+
+        self.corrections[word] = best[1] if best else None
+        return self.corrections[word]
+
+    def _windows(self, words):
+        """(concatenated key, words) of every word window, longest first."""
+        for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                window = words[start:start + size]
+                yield "".join(window), window
+
+    def _best_exact(self, words):
+        matches = []
+        for key, window in self._windows(words):
+            if key not in self.by_key:
+                continue
+            # Short words only count as the name's own words: "ME AN" is not "MEAN"
+            if (len(window) > 1 and normalize_words(self.by_key[key]) != window
+                    and min(map(len, window)) < MIN_JOINED_WORD_LENGTH):
+                continue
+            matches.append(key)
+        return self.by_key[max(matches, key=len)] if matches else None
+
+    def _match(self, words):
+        """The longest node name in the words, else the longest name containing all of them."""
+        match = self._best_exact(words)
+        if match:
+            return match
+
+        if words and all(word in self.word_counts for word in words):
+            # A name containing the whole query uses every query word, so it is
+            # among the names of the query's rarest word
+            query_key = "".join(words)
+            rarest = min(words, key=self.word_counts.get)
+            containing = [key for key in self.keys_by_word[rarest] if query_key in key]
+            if containing:
+                return self.by_key[max(containing, key=len)]
+
+        return None
+
+    def _corrected(self, words):
+        """The query words with unknown, non-common words replaced by their closest name word."""
+        corrected = []
+        for word in words:
+            if len(word) >= MIN_WORD_LENGTH and word not in self.word_counts and word not in COMMON_WORDS:
+                word = self.correct_word(word) or word
+            corrected.append(word)
+        return corrected
+
+    def _trust_correction(self, node, words, corrected):
+        """
+        A correction-driven match counts only if the name is made of several query
+        words (a typo inside a multi-word name) or a corrected word is long enough
+        that an edit rarely turns one real word into another.
+        """
+        name_words = set(normalize_words(node))
+        if len(name_words & set(corrected)) >= 2:
+            return True
+        return any(len(word) >= MIN_SINGLE_WORD_CORRECTION and fixed in name_words
+                   for word, fixed in zip(words, corrected) if word != fixed)
+
+    def lookup(self, query):
+        """
+        Maps a query to a node id:
+        1. the longest node name that appears in the query wins,
+        2. otherwise, the longest node name that contains the whole query,
+        3. only then, or when it extends that match ("LOGISTIC REGRESION" finds
+           LOGISTIC REGRESSION, not LOGISTIC), are query words that are not name
+           words corrected to the closest name word; a match through a correction
+           is kept only if _trust_correction accepts it.
+        """
+        words = normalize_words(query)
+        match = self._match(words)
+
+        corrected = self._corrected(words)
+        if corrected != words:
+            fixed = self._match(corrected)
+            if fixed and fixed != match and self._trust_correction(fixed, words, corrected):
+                if match is None or name_key(match) in name_key(fixed):
+                    return fixed
+        return match
@@ -0,0 +1,220 @@
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from graph_store import relationship_from_attrs
+
+# --- CONFIGURATION ---
+TOP_N = 30             # Context nodes returned per query (the token budget trims further)
+RESTART = 0.25         # Probability of jumping back to the seeds; higher keeps the ranking local
+EPSILON = 1e-4         # Residual mass below which a node stops spreading (bounds the work per query)
+MAX_ROUNDS = 30
+DENSE_FRACTION = 0.02  # Frontier share of all nodes above which a round is one matrix-vector product
+
+# Edge weight multipliers per relationship type: scaffolding edges carry the walk further
+TYPE_WEIGHTS = {"PREREQUISITE": 1.0, "COMPONENT": 1.0, "EVIDENCE": 0.75, "ANALOGY": 0.5, "UNKNOWN": 0.25}
+TYPES = list(TYPE_WEIGHTS)
+SCAFFOLDING = {"PREREQUISITE", "COMPONENT"}
+ANALOGY = TYPES.index("ANALOGY")
+
+
+def _edge_weight(attrs):
+    try:
+        weight = float(attrs.get("weight", 1) or 1)
+    except (TypeError, ValueError):
+        weight = 1.0
+    return max(weight, 0.0)
+
+
+class ContextRanker:
+    """
+    Personalized PageRank over the typed, weighted graph, built once at graph load.
+
+    The column-stochastic transition matrix (edge weight x type multiplier,
+    normalized per node) is stored as a SciPy CSC matrix, with the relationship
+    type of every entry in a parallel array. A query spreads mass from its seed
+    concepts in vectorized rounds: each round pushes the residual of every
+    frontier node above EPSILON along its column at once. Mass below EPSILON is
+    dropped, so a query only touches the neighbourhood that matters, never all
+    nodes, and the ranking converges to PageRank up to that residual.
+    """
+
+    def __init__(self, graph):
+        self.nodes = list(graph.nodes())
+        self.position = {node: i for i, node in enumerate(self.nodes)}
+
+        # Strongest edge decides the type when a multigraph has several between two nodes
+        pairs = {}
+        for u, v, attrs in graph.edges(data=True):
+            if u == v:
+                continue
+            rtype = relationship_from_attrs(attrs)
+            if rtype not in TYPE_WEIGHTS:
+                rtype = "UNKNOWN"
+            weight = _edge_weight(attrs) * TYPE_WEIGHTS[rtype]
+            key = (min(self.position[u], self.position[v]), max(self.position[u], self.position[v]))
+            total, best_weight, best_type = pairs.get(key, (0.0, -1.0, None))
+            if weight > best_weight:
+                best_weight, best_type = weight, TYPES.index(rtype)
+            pairs[key] = (total + weight, best_weight, best_type)
+
+        # Undirected walk: the serving code reads prerequisite edges in both directions
+        n = len(self.nodes)
+        ends = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        values = np.array([p[0] for p in pairs.values()], dtype=np.float64)
+        types = np.array([p[2] for p in pairs.values()], dtype=np.int8)
+        rows = np.concatenate([ends[:, 0], ends[:, 1]])
+        cols = np.concatenate([ends[:, 1], ends[:, 0]])
+        weights = np.concatenate([values, values])
+        types = np.concatenate([types, types])
+
+        out_weight = np.bincount(cols, weights=weights, minlength=n)
+        out_weight[out_weight == 0] = 1.0
+        # Column j holds the transition probabilities out of node j; the type of
+        # every entry is kept in a parallel array in the same (column-major) order
+        order = np.lexsort((rows, cols))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=n))])
+        self.transition = sp.csc_matrix(
+            ((weights / out_weight[cols])[order].astype(np.float32), rows[order], indptr), shape=(n, n))
+        self.types = types[order]
+        self.degree = np.diff(indptr).astype(np.float64)
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def memory_bytes(self):
+        t = self.transition
+        return t.indptr.nbytes + t.indices.nbytes + t.data.nbytes + self.types.nbytes
+
+    def _scratch(self):
+        """
+        Zeroed per-thread work arrays (estimate, residual, mask), allocated once:
+        allocating them per query would cost more than the query on large graphs.
+        """
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            n = len(self.nodes)
+            scratch = self._local.scratch = (np.zeros(n), np.zeros(n), np.zeros(n, dtype=bool))
+        return scratch
+
+    def _columns(self, columns):
+        """Positions in the matrix data of all entries of the given columns, and the column lengths."""
+        starts = self.transition.indptr[columns]
+        lengths = self.transition.indptr[columns + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum()), lengths
+
+    def scores(self, seeds, restart=RESTART, epsilon=EPSILON):
+        """
+        Personalized PageRank estimate for the seed nodes (a list, or a dict of
+        node -> weight). Returns (node positions, scores) of every node reached.
+        """
+        if not isinstance(seeds, dict):
+            seeds = dict.fromkeys(seeds, 1.0)
+        seeds = {self.position[s]: w for s, w in seeds.items() if s in self.position and w > 0}
+        if not seeds:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        n = len(self.nodes)
+        estimate, residual, _ = self._scratch()
+        frontier = np.fromiter(seeds, dtype=np.int64)
+        residual[frontier] = np.array(list(seeds.values())) / sum(seeds.values())
+        touched, reached, dense = [], [frontier], False
+
+        for _ in range(MAX_ROUNDS):
+            if len(frontier) > DENSE_FRACTION * n:
+                # Wide frontier: pushing the whole residual vector is cheaper than gathering columns
+                dense = True
+                push = np.where(residual > epsilon * self.degree, residual, 0.0)
+                touched.append(np.flatnonzero(push))
+                residual -= push
+                estimate += restart * push
+                residual += self.transition @ ((1 - restart) * push)
+                frontier = np.flatnonzero(residual > epsilon * self.degree)
+                continue
+
+            frontier = frontier[residual[frontier] > epsilon * self.degree[frontier]]
+            if not len(frontier):
+                break
+            mass = residual[frontier]
+            residual[frontier] = 0.0
+            estimate[frontier] += restart * mass
+            touched.append(frontier)
+
+            # One vectorized push: every active node spreads (1 - restart) of its residual
+            entries, lengths = self._columns(frontier)
+            targets = self.transition.indices[entries]
+            spread = self.transition.data[entries] * np.repeat((1 - restart) * mass, lengths)
+            frontier, inverse = np.unique(targets, return_inverse=True)
+            residual[frontier] += np.bincount(inverse, weights=spread, minlength=len(frontier))
+            reached.append(frontier)
+
+        positions = np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.int64)
+        result = estimate[positions]
+
+        # Hand the work arrays back zeroed, touching only what this query wrote
+        if dense:
+            estimate.fill(0.0)
+            residual.fill(0.0)
+        else:
+            estimate[positions] = 0.0
+            residual[np.concatenate(reached)] = 0.0
+        return positions, result
+
+    def top_nodes(self, seeds, top_n=TOP_N):
+        """The top_n highest-scoring nodes other than the seeds, as [(node, score)] best first."""
+        positions, scores = self.scores(seeds)
+        seed_positions = {self.position[s] for s in seeds if s in self.position}
+        keep = np.array([p not in seed_positions for p in positions.tolist()], dtype=bool)
+        positions, scores = positions[keep], scores[keep]
+        if len(positions) > top_n:
+            best = np.argpartition(-scores, top_n)[:top_n]
+            positions, scores = positions[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.nodes[p], float(s)) for p, s in zip(positions[order].tolist(), scores[order].tolist())]
+
+    def _links(self, node):
+        """(neighbour positions, relationship type codes, transition probabilities) of a node."""
+        column = self.position[node]
+        entries = slice(self.transition.indptr[column], self.transition.indptr[column + 1])
+        return self.transition.indices[entries], self.types[entries], self.transition.data[entries]
+
+    def get_pedagogical_subgraph(self, target_node, top_n=TOP_N):
+        """
+        Same buckets as graph_traversal.get_pedagogical_subgraph, from the top_n nodes
+        by PageRank around the target. Each node is bucketed by its strongest
+        edge to the target or to a higher-ranked node: prerequisite/component
+        edges make it a prerequisite, analogy edges to the target a sibling,
+        evidence edges (or chunk nodes) evidence. context_nodes maps every node
+        to its score so the context can be packed in ranking order.
+        """
+        ranked = self.top_nodes([target_node], top_n)
+        context_nodes = {target_node: 1.0}
+        prereqs, siblings, evidence = [], [], []
+        target = self.position[target_node]
+        is_placed = self._scratch()[2]
+        is_placed[target] = True
+
+        for node, score in ranked:
+            context_nodes[node] = score
+            neighbours, types, strengths = self._links(node)
+            linked = is_placed[neighbours]
+            rtype = TYPES[types[linked][np.argmax(strengths[linked])]] if linked.any() else None
+            if (types[neighbours == target] == ANALOGY).any():
+                rtype = "ANALOGY"
+            is_placed[self.position[node]] = True
+
+            if rtype in SCAFFOLDING:
+                prereqs.append(node)
+            elif rtype == "ANALOGY":
+                siblings.append(node)
+            elif rtype == "EVIDENCE" or "chunk" in str(node).lower():
+                evidence.append(node)
+
+        is_placed[[self.position[node] for node in context_nodes]] = False
+
+        # Lower-ranked prerequisites sit further from the target: most fundamental first
+        prereqs.reverse()
+        return context_nodes, prereqs, siblings, evidence
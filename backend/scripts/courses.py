@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict, Counter
+
+import networkx as nx
+
+from concept_index import ConceptIndex
+from graph_store import GraphStore
+from community_reports import load_reports
+from chunk_store import open_chunk_source
+from context_ranker import ContextRanker
+from metrics import CACHE_TOTAL
+from ingest_config import DATA_DIR
+
+# --- CONFIGURATION ---
+COURSES_PATH = os.path.join(DATA_DIR, "courses.json")
+ACTIVITY_PATH = os.path.join(DATA_DIR, "course_activity.json")
+
+DEFAULT_COURSE = "default"
+MEMORY_BUDGET_MB = int(os.getenv("COURSE_MEMORY_MB", 4096))
+PRELOAD_TOP_N = int(os.getenv("PRELOAD_COURSES", 3)) # Most active courses loaded at startup
+
+# Rough in-memory cost of a networkx node/edge and an index entry, on top of their strings
+# (calibrated with tracemalloc on knowledge_graph_classified.graphml)
+GRAPH_ITEM_BYTES = 1700
+INDEX_ENTRY_BYTES = 512
+
+logger = logging.getLogger("erica.courses")
+
+
+def _string_bytes(values):
+    return sum(sys.getsizeof(v) for v in values if isinstance(v, str))
+
+
+def estimate_bytes(graph, index, text_chunks, ranker=None):
+    """Approximate memory held by one loaded course."""
+    total = INDEX_ENTRY_BYTES * len(index)
+    if ranker is not None:
+        total += ranker.memory_bytes()
+    if isinstance(graph, nx.Graph):
+        total += GRAPH_ITEM_BYTES * (graph.number_of_nodes() + graph.number_of_edges())
+        total += sum(sys.getsizeof(n) + _string_bytes(d.values()) for n, d in graph.nodes(data=True))
+        total += sum(_string_bytes(d.values()) for _, _, d in graph.edges(data=True))
+    return total + text_chunks.memory_bytes()
+
+
+class CourseData:
+    """
+    Everything one course serves from memory. A request keeps its own reference,
+    so evicting the course never pulls data from under a running request.
+    """
+
+    def __init__(self, course_id, graph, reports, text_chunks, vector_db, mtime, rank_context=True):
+        self.course_id = course_id
+        self.graph = graph
+        self.index = ConceptIndex(graph.nodes()) # Built once per graph version
+        # PageRank transition matrix for context ranking, only when it is enabled (it counts against
+        # the memory budget); a GraphStore keeps its indexed queries
+        self.ranker = ContextRanker(graph) if rank_context and isinstance(graph, nx.Graph) else None
+        self.reports = reports
+        self.text_chunks = text_chunks
+        self.vector_db = vector_db
+        self.mtime = mtime
+        self.size_bytes = estimate_bytes(graph, self.index, text_chunks, self.ranker)
+
+
+class Course:
+    """Where a course's graph, GraphRAG working dir and vector DB live on disk."""
+
+    def __init__(self, course_id, graph_path, working_dir, vector_db, preload=False):
+        self.course_id = course_id
+        self.graph_path = graph_path
+        self.working_dir = working_dir
+        self.vector_db = vector_db
+        self.preload = preload
+        self.lock = threading.Lock() # One load at a time per course
+
+    def mtime(self):
+        if not os.path.exists(self.graph_path):
+            raise FileNotFoundError(f"Graph for course '{self.course_id}' not found at {self.graph_path}")
+        return os.path.getmtime(self.graph_path)
+
+    def load(self, mtime, rank_context=True):
+        start = time.perf_counter()
+        # A .db path is a SQLite graph store (graph_store.py); only the concept index is held in memory
+        if self.graph_path.endswith(".db"):
+            graph = GraphStore(self.graph_path)
+        else:
+            graph = nx.read_graphml(self.graph_path)
+
+        reports = load_reports(os.path.join(self.working_dir, "kv_store_community_reports.json"))
+        # Indexed chunk store if built (chunk_store.py), else the JSON KV store in memory
+        text_chunks = open_chunk_source(self.working_dir)
+
+        data = CourseData(self.course_id, graph, reports, text_chunks, self.vector_db, mtime, rank_context)
+        logger.info("Loaded course %s: %d concepts, ~%.1f MB in %.2fs", self.course_id,
+                    graph.number_of_nodes(), data.size_bytes / 1e6, time.perf_counter() - start)
+        return data
+
+
+class CourseRegistry:
+    """
+    Course ID -> course, loaded lazily on first use (and again when its graph file
+    changes). Loaded courses are kept in LRU order and the least recently used ones
+    are evicted once their estimated size exceeds the memory budget. With
+    rank_context=False no PageRank ranker is built (CONTEXT_RANKING=traversal).
+    """
+
+    def __init__(self, courses, memory_budget_mb=MEMORY_BUDGET_MB, rank_context=True):
+        self.courses = courses
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.rank_context = rank_context
+        self.loaded = OrderedDict() # course_id -> CourseData, least recently used first
+        self.activity = Counter()
+        self.lock = threading.Lock()
+
+    def __contains__(self, course_id):
+        return course_id in self.courses
+
+    def get(self, course_id=None, track=True):
+        """Loaded data of a course. Raises KeyError for unknown IDs."""
+        course = self.courses[course_id or DEFAULT_COURSE]
+        mtime = course.mtime()
+
+        with self.lock:
+            if track:
+                self.activity[course.course_id] += 1
+            data = self.loaded.get(course.course_id)
+            if data is not None and data.mtime == mtime:
+                self.loaded.move_to_end(course.course_id)
+                CACHE_TOTAL.inc(cache="graph", result="hit")
+                return data
+
+        with course.lock:
+            # Another request may have loaded it while this one waited
+            with self.lock:
+                data = self.loaded.get(course.course_id)
+            if data is None or data.mtime != mtime:
+                CACHE_TOTAL.inc(cache="graph", result="miss")
+                data = course.load(mtime, self.rank_context)
+                with self.lock:
+                    self.loaded[course.course_id] = data
+                    self.loaded.move_to_end(course.course_id)
+                    self._evict(keep=course.course_id)
+        return data
+
+    def _evict(self, keep):
+        """Drops least recently used courses until the budget holds (never `keep`)."""
+        while sum(d.size_bytes for d in self.loaded.values()) > self.memory_budget and len(self.loaded) > 1:
+            course_id = next(cid for cid in self.loaded if cid != keep)
+            evicted = self.loaded.pop(course_id)
+            logger.info("Evicted course %s (~%.1f MB)", course_id, evicted.size_bytes / 1e6)
+
+    def preload(self, top_n=PRELOAD_TOP_N, activity_path=ACTIVITY_PATH):
+        """Loads the courses marked 'preload' plus the most active ones of the last run."""
+        course_ids = [cid for cid, course in self.courses.items() if course.preload]
+        if os.path.exists(activity_path):
+            with open(activity_path, "r", encoding="utf-8") as f:
+                activity = Counter(json.load(f))
+            course_ids += [cid for cid, _ in activity.most_common() if cid in self.courses][:top_n]
+
+        for course_id in dict.fromkeys(course_ids):
+            try:
+                self.get(course_id, track=False)
+            except FileNotFoundError as e:
+                logger.warning("Skipping preload: %s", e)
+
+    def save_activity(self, activity_path=ACTIVITY_PATH):
+        """Adds this run's request counts per course to the file read by preload() (call once, at exit)."""
+        with self.lock:
+            activity = Counter(self.activity)
+        if os.path.exists(activity_path):
+            with open(activity_path, "r", encoding="utf-8") as f:
+                activity.update(json.load(f))
+        with open(activity_path, "w", encoding="utf-8") as f:
+            json.dump(activity, f, indent=2)
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(DATA_DIR, path)
+
+
+def load_registry(default_course, path=COURSES_PATH, memory_budget_mb=MEMORY_BUDGET_MB, rank_context=True):
+    """
+    Registry of the default course plus the ones in courses.json:
+    {"<course_id>": {"graph": ..., "working_dir": ..., "vector_db": ..., "preload": false}}
+    Relative paths are resolved against backend/data.
+    """
+    courses = {default_course.course_id: default_course}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for course_id, entry in json.load(f).items():
+                courses[course_id] = Course(
+                    course_id,
+                    _resolve(entry["graph"]),
+                    _resolve(entry.get("working_dir", os.path.dirname(entry["graph"]))),
+                    _resolve(entry.get("vector_db", os.path.join(os.path.dirname(entry["graph"]), "vector.db"))),
+                    preload=entry.get("preload", False),
+                )
+    return CourseRegistry(courses, memory_budget_mb, rank_context)
@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import zlib
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from ingest_config import SCRAPED_DIR, DEDUPED_DIR, DEDUPE_REPORT_PATH, count_tokens
+
+# --------- CONFIG ---------
+INPUT_DIR = SCRAPED_DIR
+OUTPUT_DIR = DEDUPED_DIR
+REPORT_PATH = DEDUPE_REPORT_PATH
+
+SHINGLE_SIZE = 5            # Words per shingle
+NUM_PERM = 128              # MinHash signature length
+BANDS = 16                  # LSH bands x rows = NUM_PERM; (1/16)^(1/8) ~ 0.7 Jaccard to become a candidate
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.8  # Exact shingle Jaccard at which two chunks are the same text
+SEED = 1
+
+EMBED_PRICE_PER_MTOK = 0.02 # USD per million embedded tokens
+EMBED_DIM = 1536
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+# --------- MINHASH ---------
+def shingles(text):
+    """Hashed word n-grams of the lower-cased text (the whole text if it is shorter)."""
+    words = re.findall(r"\w+", text.lower())
+    grams = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    return {zlib.crc32(g.encode("utf-8")) & MERSENNE_PRIME for g in grams if g}
+
+
+class MinHasher:
+    """NUM_PERM universal hash functions (a * x + b) mod p applied to all shingles at once."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(len(self.a), MERSENNE_PRIME, dtype=np.uint64)
+        x = np.fromiter(shingle_set, dtype=np.uint64)[:, None]
+        return ((x * self.a + self.b) % MERSENNE_PRIME).min(axis=0)
+
+
+def lsh_candidates(signatures):
+    """Pairs of chunks whose signatures agree on every row of at least one band."""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for i, sig in enumerate(signatures):
+            buckets[sig[band * ROWS:(band + 1) * ROWS].tobytes()].append(i)
+        for members in buckets.values():
+            for j in range(1, len(members)):
+                for i in members[:j]:
+                    pairs.add((i, members[j]))
+    return pairs
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        self.parent[self.find(j)] = self.find(i)
+
+
+# --------- DEDUPE ---------
+def load_pages(input_dir):
+    pages = []
+    for filename in sorted(os.listdir(input_dir)):
+        if filename.endswith(".json"):
+            with open(os.path.join(input_dir, filename), "r", encoding="utf-8") as f:
+                pages.append((filename, json.load(f)))
+    return pages
+
+
+def dedupe(pages):
+    """
+    Groups near-duplicate chunks across all pages. Returns the chunk list
+    [(filename, url, chunk_index, text)] and a canonical index per chunk.
+    """
+    chunks = [(filename, page.get("url", ""), i, text)
+              for filename, page in pages for i, text in enumerate(page.get("chunks", []))]
+    shingle_sets = [shingles(text) for _, _, _, text in chunks]
+    hasher = MinHasher()
+    signatures = [hasher.signature(s) for s in shingle_sets]
+
+    groups = UnionFind(len(chunks))
+    for i, j in lsh_candidates(signatures):
+        if jaccard(shingle_sets[i], shingle_sets[j]) >= SIMILARITY_THRESHOLD:
+            groups.union(i, j)
+
+    # The last chunk of a page often lies entirely inside the previous chunk's overlap
+    for i in range(1, len(chunks)):
+        if chunks[i][0] == chunks[i - 1][0] and shingle_sets[i] <= shingle_sets[i - 1]:
+            groups.union(i - 1, i)
+
+    # Canonical chunk of a group: the longest text (it covers the others)
+    canonical = {}
+    for i in range(len(chunks)):
+        root = groups.find(i)
+        if root not in canonical or len(chunks[i][3]) > len(chunks[canonical[root]][3]):
+            canonical[root] = i
+    return chunks, [canonical[groups.find(i)] for i in range(len(chunks))]
+
+
+class StreamingDeduper:
+    """
+    dedupe() for chunks that arrive one at a time (ingest_pipeline.py). Each new
+    chunk is compared only with the kept chunks that share an LSH band bucket
+    with it. The first copy seen is kept: which copy is longest is only known
+    once the stream ends.
+    """
+
+    def __init__(self):
+        self.hasher = MinHasher()
+        self.buckets = [defaultdict(list) for _ in range(BANDS)]
+        self.kept = [] # Shingle sets of the kept chunks
+
+    def add(self, shingle_set):
+        """Index of the kept chunk this one near-duplicates, or None (it is then kept)."""
+        signature = self.hasher.signature(shingle_set)
+        keys = [signature[band * ROWS:(band + 1) * ROWS].tobytes() for band in range(BANDS)]
+        for band, key in enumerate(keys):
+            for i in self.buckets[band].get(key, ()):
+                if jaccard(shingle_set, self.kept[i]) >= SIMILARITY_THRESHOLD:
+                    return i
+
+        for band, key in enumerate(keys):
+            self.buckets[band][key].append(len(self.kept))
+        self.kept.append(shingle_set)
+        return None
+
+
+def write_output(pages, chunks, canonical_of, output_dir):
+    """
+    One file per scraped page, in the scraper's format, keeping only the
+    canonical chunks it holds. Each chunk lists the URLs of every copy it replaces.
+    """
+    provenance = defaultdict(list)
+    for i, (_, url, _, _) in enumerate(chunks):
+        if url not in provenance[canonical_of[i]]:
+            provenance[canonical_of[i]].append(url)
+
+    kept = defaultdict(list)
+    for i, (filename, url, chunk_index, text) in enumerate(chunks):
+        if canonical_of[i] == i:
+            kept[filename].append({"chunk_index": chunk_index, "text": text, "sources": provenance[i]})
+
+    os.makedirs(output_dir, exist_ok=True)
+    for filename, page in pages:
+        with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as f:
+            json.dump({"url": page.get("url", ""), "text": page.get("text", ""), "chunks": kept[filename]},
+                      f, ensure_ascii=False, indent=2)
+
+
+def savings_report(chunks, canonical_of):
+    removed = [i for i in range(len(chunks)) if canonical_of[i] != i]
+    tokens = [count_tokens(text) for _, _, _, text in chunks]
+    removed_tokens = sum(tokens[i] for i in removed)
+    # vec0 row: float32 vector + stored text
+    removed_bytes = sum(EMBED_DIM * 4 + len(chunks[i][3].encode("utf-8")) for i in removed)
+    return {
+        "chunks_before": len(chunks),
+        "chunks_after": len(chunks) - len(removed),
+        "duplicate_groups": len({canonical_of[i] for i in removed}),
+        "embedding_tokens_before": sum(tokens),
+        "embedding_tokens_saved": removed_tokens,
+        "embedding_cost_saved_usd": round(removed_tokens / 1e6 * EMBED_PRICE_PER_MTOK, 6),
+        "index_bytes_saved": removed_bytes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate scraped chunks before ingest.py.")
+    parser.add_argument("--input", default=INPUT_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    pages = load_pages(args.input)
+    chunks, canonical_of = dedupe(pages)
+    write_output(pages, chunks, canonical_of, args.output)
+
+    report = savings_report(chunks, canonical_of)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Chunks: {report['chunks_before']} -> {report['chunks_after']} "
+          f"({report['duplicate_groups']} duplicate groups)")
+    print(f"Embedding tokens saved: {report['embedding_tokens_saved']} of {report['embedding_tokens_before']} "
+          f"(${report['embedding_cost_saved_usd']})")
+    print(f"Index size saved: {report['index_bytes_saved'] / 1e6:.2f} MB")
+    print(f"Saved deduplicated chunks -> {args.output}, report -> {REPORT_PATH}")
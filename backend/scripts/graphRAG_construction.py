@@ -1,21 +1,19 @@
 import asyncio
 import os
 import json
+import random
 import logging
 import glob
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 from nano_graphrag import GraphRAG
 from nano_graphrag.prompt import PROMPTS
+from ingest_config import WORKING_DIR, SCRAPED_DIR, GRAPH_MODEL
 
 # CONFIGURATION 
 load_dotenv()
-MODEL = "gpt-4o-mini"
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-BACKEND_ROOT = os.path.dirname(SCRIPT_DIR)
-WORKING_DIR = os.path.join(BACKEND_ROOT, "data", "erica_graph_storage")
-INPUT_DIR = os.path.join(BACKEND_ROOT, "data", "scraped_json")
+MODEL = GRAPH_MODEL
+INPUT_DIR = SCRAPED_DIR
 
 
 logging.basicConfig(level=logging.WARNING)
@@ -148,18 +146,21 @@ async def openai_func(prompt, system_prompt=None, history_messages=[], **kwargs)
     print("❌ Failed after max retries. Skipping chunk.")
     return ""
 
-if __name__ == "__main__":
-
-    # Initialize GraphRAG with our RAW DEBUGGER
-    # We disable cache to ensure it hits the API and prints to console
-    rag = GraphRAG(
-        working_dir=WORKING_DIR,
+def build_rag(working_dir=WORKING_DIR):
+    """GraphRAG instance with the ERICA extraction prompt (also used by ingest_pipeline.py)."""
+    return GraphRAG(
+        working_dir=working_dir,
         enable_llm_cache=True, 
         best_model_func=openai_func, 
         cheap_model_func=openai_func, 
         cheap_model_max_async=3, 
         best_model_max_async=3
     )
+
+if __name__ == "__main__":
+
+    # Initialize GraphRAG with our RAW DEBUGGER
+    rag = build_rag()
     
     json_files = glob.glob(os.path.join(INPUT_DIR, "*.json"))
     print(f"found {len(json_files)} JSON files to process.")
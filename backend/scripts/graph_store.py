@@ -0,0 +1,300 @@
+import os
+import sqlite3
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+
+import networkx as nx
+
+from ingest_config import DATA_DIR, default_graph_path
+
+# --- CONFIGURATION ---
+GRAPH_DB_PATH = os.path.join(DATA_DIR, "knowledge_graph.db")
+
+GRAPHML_NS = "{http://graphml.graphdrawing.org/xmlns}"
+VALID_TYPES = {"PREREQUISITE", "COMPONENT", "ANALOGY", "EVIDENCE"}
+# Bound on the recursive prerequisite walk (the graph has cycles). Deliberately differs from the
+# unbounded networkx traversal: chains deeper than this are cut (LOGISTIC REGRESSION: 1194 vs. 1209
+# nodes), which bounds the query cost on large graphs; the token budget drops such nodes anyway.
+MAX_PREREQ_DEPTH = 8
+INSERT_BATCH_SIZE = 5000
+SQL_VARIABLE_LIMIT = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    entity_type TEXT,
+    description TEXT,
+    description_tokens INTEGER,
+    source_id TEXT,
+    clusters TEXT
+);
+CREATE TABLE IF NOT EXISTS edges (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    relationship_type TEXT,
+    weight REAL,
+    description TEXT,
+    source_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_edges_source_type ON edges(source, relationship_type);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target);
+"""
+
+NODE_COLUMNS = ("entity_type", "description", "description_tokens", "source_id", "clusters")
+
+
+def relationship_from_attrs(attrs):
+    """Same rule as the serving code: 'relationship_type' first, then any known label value."""
+    if "relationship_type" in attrs:
+        return str(attrs["relationship_type"]).upper()
+    for value in attrs.values():
+        if isinstance(value, str) and value.upper() in VALID_TYPES:
+            return value.upper()
+    return "UNKNOWN"
+
+
+def _convert(value, attr_type):
+    if attr_type in ("double", "float"):
+        return float(value)
+    if attr_type in ("int", "long"):
+        return int(value)
+    return value
+
+
+def iter_graphml(path):
+    """
+    Streams ("node", id, attrs) and ("edge", (source, target), attrs) records out of a
+    GraphML file without building the whole graph in memory. Yields ("directed", bool, None) first.
+    """
+    keys = {}
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        tag = elem.tag.replace(GRAPHML_NS, "")
+        if event == "start":
+            if tag == "graph":
+                yield "directed", elem.get("edgedefault") == "directed", None
+            continue
+
+        if tag == "key":
+            keys[elem.get("id")] = (elem.get("attr.name"), elem.get("attr.type"))
+        elif tag in ("node", "edge"):
+            attrs = {}
+            for data in elem.findall(f"{GRAPHML_NS}data"):
+                name, attr_type = keys.get(data.get("key"), (data.get("key"), "string"))
+                attrs[name] = _convert(data.text or "", attr_type)
+            if tag == "node":
+                yield "node", elem.get("id"), attrs
+            else:
+                yield "edge", (elem.get("source"), elem.get("target")), attrs
+            elem.clear()
+
+
+def build_graph_store(graphml_path, db_path=GRAPH_DB_PATH):
+    """Loads a GraphML file into the nodes/edges tables, replacing their contents."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.execute("DELETE FROM nodes")
+    conn.execute("DELETE FROM edges")
+
+    directed = False
+    nodes, edges = [], []
+    node_count = edge_count = 0
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?)", nodes)
+        conn.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?)", edges)
+        nodes.clear()
+        edges.clear()
+
+    for kind, key, attrs in iter_graphml(graphml_path):
+        if kind == "directed":
+            directed = key
+        elif kind == "node":
+            nodes.append((key,) + tuple(attrs.get(col) for col in NODE_COLUMNS))
+            node_count += 1
+        else:
+            source, target = key
+            row = (relationship_from_attrs(attrs), attrs.get("weight"),
+                   attrs.get("description"), attrs.get("source_id"))
+            edges.append((source, target) + row)
+            # Undirected edges are stored both ways so every neighbour lookup is one index seek
+            if not directed and source != target:
+                edges.append((target, source) + row)
+            edge_count += 1
+
+        if len(nodes) + len(edges) >= INSERT_BATCH_SIZE:
+            flush()
+
+    flush()
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('directed', ?)", (str(int(directed)),))
+    conn.commit()
+    conn.close()
+    return node_count, edge_count
+
+
+class GraphStore:
+    """
+    Read side of the SQLite graph store used by the tutor server.
+    Only the nodes a request touches are read; nothing is kept in memory.
+    """
+
+    def __init__(self, db_path=GRAPH_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def nodes(self):
+        for (node_id,) in self.conn.execute("SELECT id FROM nodes"):
+            yield node_id
+
+    def number_of_nodes(self):
+        return self.conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def _in_batches(self, items):
+        items = list(items)
+        for start in range(0, len(items), SQL_VARIABLE_LIMIT):
+            yield items[start:start + SQL_VARIABLE_LIMIT]
+
+    def prerequisite_chain(self, target_node):
+        """
+        Every node reachable from the target over PREREQUISITE/COMPONENT edges
+        within MAX_PREREQ_DEPTH hops, most fundamental (deepest) first.
+        """
+        rows = self.conn.execute("""
+            WITH RECURSIVE chain(node, depth) AS (
+                SELECT ?, 0
+                UNION
+                SELECT e.target, c.depth + 1
+                FROM chain c
+                JOIN edges e ON e.source = c.node
+                WHERE e.relationship_type IN ('PREREQUISITE', 'COMPONENT')
+                  AND c.depth < ?
+            )
+            SELECT node, MIN(depth) AS depth FROM chain
+            WHERE node != ?
+            GROUP BY node
+            ORDER BY depth DESC, node
+        """, (target_node, MAX_PREREQ_DEPTH, target_node)).fetchall()
+        return [node for node, _ in rows]
+
+    def neighbors_by_type(self, node, relationship_type):
+        rows = self.conn.execute(
+            "SELECT target FROM edges WHERE source = ? AND relationship_type = ?",
+            (node, relationship_type))
+        return [target for (target,) in rows]
+
+    def evidence_for(self, nodes):
+        """EVIDENCE neighbours of the given nodes, plus neighbours that are chunk nodes."""
+        found = []
+        for batch in self._in_batches(nodes):
+            marks = ",".join("?" * len(batch))
+            rows = self.conn.execute(f"""
+                SELECT DISTINCT target FROM edges
+                WHERE source IN ({marks})
+                  AND (relationship_type = 'EVIDENCE' OR LOWER(target) LIKE '%chunk%')
+            """, batch)
+            found.extend(target for (target,) in rows)
+        return found
+
+    def get_pedagogical_subgraph(self, target_node):
+        """
+        Same buckets as graph_traversal.get_pedagogical_subgraph, answered with indexed
+        queries. Unlike the traversal, prerequisites stop at MAX_PREREQ_DEPTH.
+        """
+        context_nodes = {target_node}
+
+        prereqs = self.prerequisite_chain(target_node)
+        context_nodes.update(prereqs)
+
+        siblings = []
+        for neighbor in self.neighbors_by_type(target_node, "ANALOGY"):
+            if neighbor not in context_nodes:
+                siblings.append(neighbor)
+                context_nodes.add(neighbor)
+
+        evidence = []
+        for neighbor in self.evidence_for(list(context_nodes)):
+            if neighbor not in context_nodes:
+                evidence.append(neighbor)
+                context_nodes.add(neighbor)
+
+        return context_nodes, prereqs, siblings, evidence
+
+    def subgraph(self, nodes):
+        """Materializes just these nodes and the edges among them as a small networkx graph."""
+        G = nx.Graph()
+        nodes = list(nodes)
+        for batch in self._in_batches(nodes):
+            marks = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT id, {', '.join(NODE_COLUMNS)} FROM nodes WHERE id IN ({marks})", batch)
+            for row in rows:
+                attrs = {col: value for col, value in zip(NODE_COLUMNS, row[1:]) if value is not None}
+                G.add_node(row[0], **attrs)
+
+        node_set = set(nodes)
+        for batch in self._in_batches(nodes):
+            marks = ",".join("?" * len(batch))
+            rows = self.conn.execute(f"""
+                SELECT source, target, relationship_type, weight, description FROM edges
+                WHERE source IN ({marks})
+            """, batch)
+            for source, target, rtype, weight, description in rows:
+                if target in node_set:
+                    G.add_edge(source, target, relationship_type=rtype,
+                               weight=weight or 0.0, description=description or "")
+        return G
+
+
+def _is_directed(conn):
+    """Whether the store was built from a directed GraphML (undirected edges are stored both ways)."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'directed'").fetchone()
+    return row is not None and row[0] == "1"
+
+
+def unclassified_edges(db_path=GRAPH_DB_PATH):
+    """Edges without a valid relationship label, each undirected pair once."""
+    conn = sqlite3.connect(db_path)
+    # Only an undirected store holds every edge twice; a directed one stores each edge once
+    pair_filter = "" if _is_directed(conn) else "AND source <= target"
+    rows = conn.execute(f"""
+        SELECT source, target, COALESCE(description, '') FROM edges
+        WHERE relationship_type NOT IN ('PREREQUISITE', 'COMPONENT', 'ANALOGY', 'EVIDENCE')
+          {pair_filter}
+    """).fetchall()
+    conn.close()
+    return rows
+
+
+def update_relationship_types(results, db_path=GRAPH_DB_PATH):
+    """Writes (source, target, classification) labels in place, for both stored directions if undirected."""
+    conn = sqlite3.connect(db_path)
+    if _is_directed(conn):
+        conn.executemany("UPDATE edges SET relationship_type = ? WHERE source = ? AND target = ?",
+                         [(label, u, v) for u, v, label in results])
+    else:
+        conn.executemany("""
+            UPDATE edges SET relationship_type = ?
+            WHERE (source = ? AND target = ?) OR (source = ? AND target = ?)
+        """, [(label, u, v, v, u) for u, v, label in results])
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a GraphML knowledge graph into the SQLite graph store.")
+    parser.add_argument("--input", default=default_graph_path())
+    parser.add_argument("--db", default=GRAPH_DB_PATH)
+    args = parser.parse_args()
+
+    print(f"--- Loading {args.input} into {args.db} ---")
+    node_count, edge_count = build_graph_store(args.input, args.db)
+    print(f"Stored {node_count} nodes and {edge_count} edges.")
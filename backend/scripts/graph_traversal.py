@@ -0,0 +1,140 @@
+import logging
+
+# The neighbour-rule traversal used with CONTEXT_RANKING=traversal. It lives apart from
+# userinput.py so bench_context.py can import it without starting the server.
+logger = logging.getLogger("erica.tutor")
+
+#  SUBGRAPH SELECTION (The Core Logic) 
+def get_pedagogical_subgraph(graph, target_node):
+    """
+    Selects a subgraph centered on the target node but explicitly 
+    prioritizes educational edges.
+    
+    Rationale:
+    - We traverse 'prereq_of' backwards to build a scaffolding chain.
+    - We grab 'near_transfer' for breadth testing.
+    - We strictly collect resources attached to these specific concepts.
+    """
+    context_nodes = {target_node}
+    
+    # Helper to handle MultiDiGraph vs DiGraph edge data
+    def get_edge_data(u, v):
+        if graph.is_multigraph():
+            return graph[u][v].values() # List of edge dicts
+        return [graph[u][v]] # List containing single edge dict
+    
+    def get_relationship_from_edge(attrs):
+        # First, try the obvious key
+        if "relationship_type" in attrs:
+            return attrs["relationship_type"].upper()
+        
+        # Fallback: Scan ALL values in the edge dictionary
+        # We look for our known keywords.
+        valid_types = {"PREREQUISITE", "COMPONENT", "ANALOGY", "EVIDENCE"}
+        for value in attrs.values():
+            if isinstance(value, str) and value.upper() in valid_types:
+                return value.upper()
+        
+        return "UNKNOWN"
+
+    
+    # Scaffolding (Find Prerequisites)
+    # Walk backwards: Who is a prereq of the target?
+    prereqs = []
+    visited_parents = {target_node}
+    stack = [target_node]
+    found_prereqs_temp = []
+
+    while stack:
+        current = stack.pop()
+
+        # FIX: Use neighbors() because your graph is undirected
+        try:
+            for parent in graph.neighbors(current):
+                
+                if parent in visited_parents:
+                    continue
+
+                edges = get_edge_data(parent, current)
+                is_valid_parent = False
+
+                for attrs in edges:
+                    rtype = get_relationship_from_edge(attrs)
+                    
+                    # LOGIC:
+                    # Even though the graph is undirected, we treat the relationship semantically.
+                    # If the edge is "PREREQUISITE" or "COMPONENT", we accept it as a parent node.
+                    if rtype in ["PREREQUISITE", "COMPONENT"]:
+                        is_valid_parent = True
+                        break
+                
+                if is_valid_parent:
+                    logger.debug("Found prereq of %s: %s", current, parent)
+                    visited_parents.add(parent)
+                    found_prereqs_temp.append(parent)
+                    context_nodes.add(parent)
+                    stack.append(parent) 
+                    
+        except Exception as e:
+             logger.warning("Error on node %s: %s", current, e)
+             continue
+    
+    # Reverse list so the most fundamental concept comes first (Root -> Leaf)
+    prereqs = found_prereqs_temp[::-1]
+
+    # B. Near Transfer (Siblings)
+    # Check Outgoing Analogies (Target -> Sibling)
+    siblings = []
+    for neighbor in graph.neighbors(target_node):
+        if neighbor in context_nodes: 
+            continue
+            
+        for attrs in get_edge_data(target_node, neighbor):
+            if get_relationship_from_edge(attrs) == "ANALOGY":
+                siblings.append(neighbor)
+                context_nodes.add(neighbor)
+                break
+
+    # C. Resources & Examples (Evidence)
+    current_context = list(context_nodes) # Snapshot to avoid 'Set changed size' error
+    evidence = []
+    for node in current_context:
+        try:
+            # FIX: Use neighbors() instead of successors()
+            for neighbor in graph.neighbors(node):
+                
+                # specific check to avoid cycles or duplicates
+                if neighbor in context_nodes: 
+                    continue
+                
+                # Get edge data for NODE <-> NEIGHBOR
+                edges = get_edge_data(node, neighbor)
+                is_evidence = False
+                
+                for attrs in edges:
+                    # Use your robust helper function
+                    rtype = get_relationship_from_edge(attrs)
+                    
+                    # 1. Strict Check: Is the relationship labeled EVIDENCE?
+                    if rtype == "EVIDENCE":
+                        is_evidence = True
+                    
+                    # 2. Heuristic Check: Does the node name look like a chunk?
+                    # (Useful if the edge label is missing/wrong)
+                    elif "chunk" in str(neighbor).lower():
+                        is_evidence = True
+                        
+                    if is_evidence: 
+                        break # Stop checking other edges if one confirms it
+                        
+                if is_evidence:
+                    evidence.append(neighbor)
+                    context_nodes.add(neighbor)
+                    
+        except Exception:
+            continue
+
+    logger.debug("Subgraph for %s: %d prereqs, %d siblings, %d evidence",
+                 target_node, len(prereqs), len(siblings), len(evidence))
+
+    return context_nodes, prereqs, siblings, evidence
@@ -3,14 +3,16 @@ import json
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from ingest_config import EMBED_DIR, EMBED_MODEL, EMBED_BATCH_SIZE, default_chunk_dir
+
 load_dotenv()
 
 
 # --------- CONFIG ---------
-INPUT_DIR = "scraped_json"
-OUTPUT_DIR = "embeddings"
-EMBED_MODEL = "text-embedding-3-small"
-BATCH_SIZE = 64   # best performance/cost tradeoff
+# Prefer the near-duplicate-free chunks from dedupe_chunks.py when they are up to date
+INPUT_DIR = default_chunk_dir()
+OUTPUT_DIR = EMBED_DIR
+BATCH_SIZE = EMBED_BATCH_SIZE
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -46,7 +48,9 @@ for filename in os.listdir(INPUT_DIR):
         data = json.load(f)
 
     url = data.get("url", "")
-    chunks = data.get("chunks", [])
+    # Scraped chunks are plain strings; deduplicated ones are {"chunk_index", "text", "sources"}
+    chunks = [c if isinstance(c, dict) else {"chunk_index": i, "text": c, "sources": [url]}
+              for i, c in enumerate(data.get("chunks", []))]
 
     output_data = {
         "url": url,
@@ -58,16 +62,16 @@ for filename in os.listdir(INPUT_DIR):
         batch = chunks[start : start + BATCH_SIZE]
         print(f"  Embedding batch {start}–{start+len(batch)-1} (size {len(batch)})")
 
-        vectors = embed_batch(batch)
+        vectors = embed_batch([chunk["text"] for chunk in batch])
 
         # Assign results
-        for i, (chunk_text, vec) in enumerate(zip(batch, vectors)):
-            chunk_index = start + i
+        for chunk, vec in zip(batch, vectors):
             if vec is None: 
                 continue
             output_data["chunks"].append({
-                "chunk_index": chunk_index,
-                "text": chunk_text,
+                "chunk_index": chunk["chunk_index"],
+                "text": chunk["text"],
+                "sources": chunk["sources"],
                 "embedding": vec
             })
 
@@ -0,0 +1,77 @@
+import os
+import logging
+
+import tiktoken
+
+# --- CONFIGURATION ---
+# Paths and parameters shared by the ingestion steps (scrape.py, dedupe_chunks.py, ingest.py,
+# init_database.py, insert_embeddings.py, graphRAG_construction.py), by ingest_pipeline.py,
+# which runs them as one streaming pipeline, and by the graph tools and the server that read
+# their output. Paths are absolute, so every step agrees on them whatever directory it is
+# started from.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_ROOT = os.path.dirname(SCRIPT_DIR)
+DATA_DIR = os.path.join(BACKEND_ROOT, "data")
+
+SCRAPED_DIR = os.path.join(DATA_DIR, "scraped_json")
+DEDUPED_DIR = os.path.join(DATA_DIR, "deduped_json")
+EMBED_DIR = os.path.join(DATA_DIR, "embeddings")
+VECTOR_DB_PATH = os.path.join(DATA_DIR, "vector.db")
+WORKING_DIR = os.path.join(DATA_DIR, "erica_graph_storage") # GraphRAG working dir
+GRAPH_PATH = os.path.join(DATA_DIR, "knowledge_graph_classified.graphml")        # patch_graph_edges.py
+COMPACT_GRAPH_PATH = os.path.join(DATA_DIR, "knowledge_graph_compacted.graphml") # compact_descriptions.py
+DEDUPE_REPORT_PATH = os.path.join(DATA_DIR, "dedupe_report.json")                 # dedupe_chunks.py
+
+COURSE_ID = os.getenv("COURSE_ID", "default") # vector DB partition the chunks are stored under
+
+FETCH_TIMEOUT = 10          # Seconds per page request
+CHUNK_SIZE = 800            # Words per chunk
+CHUNK_OVERLAP = 200         # Words shared by consecutive chunks
+EMBED_MODEL = "text-embedding-3-small"
+EMBED_BATCH_SIZE = 64       # Best performance/cost tradeoff
+GRAPH_MODEL = "gpt-4o-mini" # Entity/relationship extraction
+
+ENCODER = tiktoken.encoding_for_model(GRAPH_MODEL)
+
+logger = logging.getLogger("erica.config")
+
+
+def count_tokens(text):
+    return len(ENCODER.encode(text or ""))
+
+
+def default_graph_path():
+    """
+    The graph with compacted node descriptions if it is up to date, else the
+    classified graph. A compacted graph older than the classified one misses a
+    later re-classification (patch_graph_edges.py), so it is skipped until
+    compact_descriptions.py is re-run.
+    """
+    if not os.path.exists(COMPACT_GRAPH_PATH):
+        return GRAPH_PATH
+    if os.path.exists(GRAPH_PATH) and os.path.getmtime(GRAPH_PATH) > os.path.getmtime(COMPACT_GRAPH_PATH):
+        logger.warning("%s is older than %s; using the classified graph until compact_descriptions.py is re-run",
+                       COMPACT_GRAPH_PATH, GRAPH_PATH)
+        return GRAPH_PATH
+    return COMPACT_GRAPH_PATH
+
+
+def last_modified(directory):
+    """Latest mtime of the directory or any file in it (a re-scrape rewrites files in place)."""
+    return max([os.path.getmtime(directory)]
+               + [os.path.getmtime(os.path.join(directory, name)) for name in os.listdir(directory)])
+
+
+def default_chunk_dir():
+    """
+    The near-duplicate-free chunks from dedupe_chunks.py if they are up to date,
+    else the scraped chunks. Deduplicated chunks older than a later scrape miss
+    its pages, so they are skipped until dedupe_chunks.py is re-run.
+    """
+    if not os.path.isdir(DEDUPED_DIR):
+        return SCRAPED_DIR
+    if os.path.isdir(SCRAPED_DIR) and last_modified(SCRAPED_DIR) > last_modified(DEDUPED_DIR):
+        logger.warning("%s is older than %s; embedding the scraped chunks until dedupe_chunks.py is re-run",
+                       DEDUPED_DIR, SCRAPED_DIR)
+        return SCRAPED_DIR
+    return DEDUPED_DIR
@@ -0,0 +1,429 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import sqlite_vec
+from dotenv import load_dotenv
+
+from ingest_config import VECTOR_DB_PATH, WORKING_DIR, COURSE_ID, FETCH_TIMEOUT, EMBED_MODEL, EMBED_BATCH_SIZE
+from scrape import urls as DEFAULT_URLS, clean_html, chunk_text
+from dedupe_chunks import StreamingDeduper, shingles
+from init_database import SCHEMA, connect, add_sources
+from chunk_store import CHUNKS_DB_NAME, CHUNKS_JSON_NAME, build_chunk_store
+
+# --- CONFIGURATION ---
+load_dotenv()
+
+# Workers per stage (the graph stage writes one GraphRAG store, so it has one worker)
+FETCH_WORKERS = 8
+EXTRACT_WORKERS = 2
+EMBED_WORKERS = 4
+GRAPH_BATCH_SIZE = 4        # Pages per GraphRAG insert (it extracts their chunks concurrently)
+STORE_BATCH_SIZE = 256      # Rows per vector DB transaction
+
+# Bounded queues between stages: a slow stage makes the ones before it wait instead of piling up
+PAGE_QUEUE_SIZE = 16
+CHUNK_QUEUE_SIZE = 4 * EMBED_BATCH_SIZE
+
+EMBED_RETRIES = 3
+PROGRESS_SECS = 5
+
+DONE = object() # End of stream marker
+
+
+class StageStats:
+    """Per-stage counters: items taken in and passed on, failures, and time spent working."""
+
+    def __init__(self, name, workers=1, batch_size=1):
+        self.name = name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_secs = 0.0
+        self.finished_at = None
+
+    def summary(self, started_at):
+        elapsed = (self.finished_at or time.perf_counter()) - started_at
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "items_per_sec": round(self.items_in / elapsed, 2) if elapsed > 0 else 0.0,
+            # Share of the stage's worker time spent working: the bottleneck stage is near 1
+            "utilization": round(self.busy_secs / (elapsed * self.workers), 2) if elapsed > 0 else 0.0,
+            "finished_after_secs": round(elapsed, 1),
+        }
+
+
+async def run_stage(stats, handler, inbox, outboxes, on_done=None):
+    """
+    Runs stats.workers copies of handler(batch) -> results over the inbox until
+    the end marker, putting every result on each outbox. A worker takes one item
+    and whatever else is already queued, up to the stage's batch size, so batches
+    fill up under load without waiting for stragglers.
+    """
+    async def worker():
+        while True:
+            batch = [await inbox.get()]
+            while batch[-1] is not DONE and len(batch) < stats.batch_size and not inbox.empty():
+                batch.append(inbox.get_nowait())
+            done = batch[-1] is DONE
+            if done:
+                batch.pop()
+
+            if batch:
+                start = time.perf_counter()
+                try:
+                    results = await handler(batch)
+                except Exception as e:
+                    print(f"[{stats.name}] failed on {len(batch)} item(s): {e}")
+                    stats.errors += len(batch)
+                    results = []
+                stats.busy_secs += time.perf_counter() - start
+                stats.items_in += len(batch)
+                stats.items_out += len(results)
+                for result in results:
+                    for outbox in outboxes:
+                        await outbox.put(result)
+
+            if done:
+                await inbox.put(DONE) # The other workers of this stage stop on it too
+                return
+
+    await asyncio.gather(*(worker() for _ in range(stats.workers)))
+    if on_done is not None:
+        await on_done()
+    stats.finished_at = time.perf_counter()
+    for outbox in outboxes:
+        await outbox.put(DONE)
+
+
+class IngestPipeline:
+    """
+    fetch -> extract -> chunk -> embed -> store, with extract also feeding
+    graph-extract. Every stage runs as soon as its first input arrives, so a
+    course takes about as long as its slowest stage instead of the sum of all.
+    """
+
+    def __init__(self, urls, course_id=COURSE_ID, db_path=VECTOR_DB_PATH, working_dir=WORKING_DIR,
+                 build_graph=True, dedupe=True, replace=False):
+        self.urls = urls
+        self.course_id = course_id
+        self.db_path = db_path
+        self.working_dir = working_dir
+        self.build_graph = build_graph
+        self.dedupe = dedupe
+        self.replace = replace
+
+        self.stages = {
+            "fetch": StageStats("fetch", FETCH_WORKERS),
+            "extract": StageStats("extract", EXTRACT_WORKERS),
+            "chunk": StageStats("chunk"),
+            "embed": StageStats("embed", EMBED_WORKERS, EMBED_BATCH_SIZE),
+            "store": StageStats("store", 1, STORE_BATCH_SIZE),
+        }
+        if build_graph:
+            self.stages["graph"] = StageStats("graph", 1, GRAPH_BATCH_SIZE)
+
+        self.deduper = StreamingDeduper()
+        self.canonical = []       # Kept chunk per StreamingDeduper index (None once it failed)
+        self.duplicates = 0
+        self.stored = []          # (row id, chunk, number of sources written)
+        self.unembedded = []      # Chunks whose embed batch failed, retried when the embed stage drains
+        self.failed = []          # Chunks that could not be stored
+        self.db_thread = ThreadPoolExecutor(max_workers=1) # The SQLite connection lives on this thread
+        self.conn = None
+        self.client = None
+        self.rag = None
+
+    # --------- STAGES ---------
+    async def fetch(self, batch):
+        pages = []
+        for url in batch:
+            try:
+                response = await asyncio.to_thread(requests.get, url, timeout=FETCH_TIMEOUT)
+                response.raise_for_status()
+                pages.append({"url": url, "html": response.text})
+            except Exception as e:
+                print(f"[fetch] {url}: {e}")
+                self.stages["fetch"].errors += 1
+        return pages
+
+    async def extract(self, batch):
+        # BeautifulSoup parsing is CPU work: keep it off the event loop
+        return [{"url": page["url"], "text": await asyncio.to_thread(clean_html, page["html"])} for page in batch]
+
+    async def chunk(self, batch):
+        chunks = []
+        for page in batch:
+            previous = None # (shingle set, kept chunk) of the page's previous chunk
+            for chunk_index, text in enumerate(chunk_text(page["text"])):
+                chunk = {"url": page["url"], "chunk_index": chunk_index, "text": text, "sources": [page["url"]]}
+                if not self.dedupe:
+                    chunks.append(chunk)
+                    continue
+
+                # A tail chunk inside the previous chunk's overlap, or a near-duplicate of any kept chunk.
+                # A kept chunk that failed to embed or store frees its slot for the next near-duplicate.
+                shingle_set = shingles(text)
+                if previous is not None and shingle_set <= previous[0]:
+                    canonical = previous[1]
+                else:
+                    index = self.deduper.add(shingle_set)
+                    if index is None:
+                        index = len(self.canonical)
+                        self.canonical.append(None)
+                    canonical = self.canonical[index]
+
+                if canonical is None:
+                    chunk["dedupe_index"] = index
+                    self.canonical[index] = chunk
+                    chunks.append(chunk)
+                    canonical = chunk
+                else:
+                    if page["url"] not in canonical["sources"]:
+                        canonical["sources"].append(page["url"])
+                    self.duplicates += 1
+                previous = (shingle_set, canonical)
+        return chunks
+
+    def _release(self, chunks, failed):
+        """Chunks that were not stored give up their deduper slot and are kept on a failure list."""
+        for chunk in chunks:
+            chunk.pop("embedding", None)
+            index = chunk.get("dedupe_index")
+            if index is not None and self.canonical[index] is chunk:
+                self.canonical[index] = None
+            failed.append(chunk)
+
+    async def _embed(self, batch):
+        for attempt in range(EMBED_RETRIES):
+            try:
+                response = await self.client.embeddings.create(model=EMBED_MODEL, input=[c["text"] for c in batch])
+                break
+            except Exception as e:
+                if attempt == EMBED_RETRIES - 1:
+                    raise
+                print(f"[embed] retrying batch of {len(batch)}: {e}")
+                await asyncio.sleep(2 * (attempt + 1))
+        for chunk, item in zip(batch, response.data):
+            chunk["embedding"] = item.embedding
+        return batch
+
+    async def embed(self, batch):
+        try:
+            return await self._embed(batch)
+        except Exception as e:
+            print(f"[embed] batch of {len(batch)} failed, retrying it at the end: {e}")
+            self._release(batch, self.unembedded)
+            return []
+
+    async def retry_embeds(self, store_queue):
+        """Embeds the failed batches once more before the store stage closes; what still fails is lost."""
+        retry, self.unembedded = self.unembedded, []
+        if retry:
+            print(f"[embed] Retrying {len(retry)} chunk(s) from failed batches")
+        for i in range(0, len(retry), EMBED_BATCH_SIZE):
+            batch = retry[i:i + EMBED_BATCH_SIZE]
+            try:
+                await self._embed(batch)
+            except Exception as e:
+                print(f"[embed] failed on {len(batch)} chunk(s): {e}")
+                self.stages["embed"].errors += len(batch)
+                self.failed.extend(batch)
+                continue
+            self.stages["embed"].items_out += len(batch)
+            for chunk in batch:
+                await store_queue.put(chunk)
+
+    async def on_db_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.db_thread, fn, *args)
+
+    def _write_rows(self, batch):
+        cur = self.conn.cursor()
+        stored = []
+        try:
+            for chunk in batch:
+                cur.execute("""
+                    INSERT INTO documents (course_id, source, chunk_index, chunk_text, sources, embedding)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (self.course_id, chunk["url"], chunk["chunk_index"], chunk["text"],
+                      json.dumps(chunk["sources"]), sqlite_vec.serialize_float32(chunk["embedding"])))
+                stored.append((cur.lastrowid, chunk, len(chunk["sources"])))
+                add_sources(cur, cur.lastrowid, chunk["sources"])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        for _, chunk, _ in stored:
+            del chunk["embedding"]
+        self.stored.extend(stored)
+
+    async def store(self, batch):
+        try:
+            await self.on_db_thread(self._write_rows, batch)
+        except Exception as e:
+            print(f"[store] failed on {len(batch)} chunk(s): {e}")
+            self.stages["store"].errors += len(batch)
+            self._release(batch, self.failed)
+        return []
+
+    def _update_sources(self):
+        """Duplicates found after their canonical chunk was stored add their URLs afterwards."""
+        cur = self.conn.cursor()
+        for row_id, chunk, written in self.stored:
+            if len(chunk["sources"]) > written:
+                cur.execute("UPDATE documents SET sources = ? WHERE id = ?", (json.dumps(chunk["sources"]), row_id))
+                add_sources(cur, row_id, chunk["sources"][written:])
+        self.conn.commit()
+
+    async def finish_store(self):
+        await self.on_db_thread(self._update_sources)
+
+    async def graph(self, batch):
+        await self.rag.ainsert([page["text"] for page in batch])
+        return []
+
+    async def finish_graph(self):
+        """Rebuilds the chunk store (if the working dir has one) so it holds the new evidence chunks."""
+        db_path = os.path.join(self.working_dir, CHUNKS_DB_NAME)
+        if os.path.exists(db_path):
+            count = await asyncio.to_thread(
+                build_chunk_store, os.path.join(self.working_dir, CHUNKS_JSON_NAME), db_path)
+            print(f"[graph] Rebuilt {db_path} ({count} chunks)")
+
+    # --------- RUN ---------
+    def _open_db(self):
+        self.conn = connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+        if self.replace:
+            self.conn.execute(
+                "DELETE FROM document_sources WHERE document_id IN (SELECT id FROM documents WHERE course_id = ?)",
+                (self.course_id,))
+            self.conn.execute("DELETE FROM documents WHERE course_id = ?", (self.course_id,))
+        self.conn.commit()
+
+    async def report_progress(self, started_at, queues):
+        while True:
+            await asyncio.sleep(PROGRESS_SECS)
+            elapsed = time.perf_counter() - started_at
+            parts = [f"{name} {s.items_in}" + (f" ({s.items_in / elapsed:.1f}/s)" if s.items_in else "")
+                     for name, s in self.stages.items()]
+            backlog = " ".join(f"{name}:{q.qsize()}" for name, q in queues.items())
+            print(f"[{elapsed:6.1f}s] {' | '.join(parts)} | queued {backlog}")
+
+    async def run(self):
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI()
+        await self.on_db_thread(self._open_db)
+        if self.build_graph:
+            from graphRAG_construction import build_rag
+            self.rag = build_rag(self.working_dir)
+
+        queues = {
+            "fetch": asyncio.Queue(PAGE_QUEUE_SIZE),
+            "extract": asyncio.Queue(PAGE_QUEUE_SIZE),
+            "chunk": asyncio.Queue(PAGE_QUEUE_SIZE),
+            "embed": asyncio.Queue(CHUNK_QUEUE_SIZE),
+            "store": asyncio.Queue(CHUNK_QUEUE_SIZE),
+        }
+        extracted_to = [queues["chunk"]]
+        if self.build_graph:
+            queues["graph"] = asyncio.Queue(PAGE_QUEUE_SIZE)
+            extracted_to.append(queues["graph"])
+
+        started_at = time.perf_counter()
+        stages = [
+            run_stage(self.stages["fetch"], self.fetch, queues["fetch"], [queues["extract"]]),
+            run_stage(self.stages["extract"], self.extract, queues["extract"], extracted_to),
+            run_stage(self.stages["chunk"], self.chunk, queues["chunk"], [queues["embed"]]),
+            run_stage(self.stages["embed"], self.embed, queues["embed"], [queues["store"]],
+                      on_done=lambda: self.retry_embeds(queues["store"])),
+            run_stage(self.stages["store"], self.store, queues["store"], [], on_done=self.finish_store),
+        ]
+        if self.build_graph:
+            stages.append(run_stage(self.stages["graph"], self.graph, queues["graph"], [],
+                                    on_done=self.finish_graph))
+
+        async def feed():
+            for url in self.urls:
+                await queues["fetch"].put(url)
+            await queues["fetch"].put(DONE)
+
+        progress = asyncio.create_task(self.report_progress(started_at, queues))
+        try:
+            await asyncio.gather(feed(), *stages)
+        finally:
+            progress.cancel()
+            if self.conn is not None:
+                await self.on_db_thread(self.conn.close)
+            self.db_thread.shutdown()
+
+        return {
+            "course_id": self.course_id,
+            "pages": len(self.urls),
+            "chunks_stored": len(self.stored),
+            "chunks_failed": len(self.failed),
+            "duplicate_chunks": self.duplicates,
+            "total_secs": round(time.perf_counter() - started_at, 1),
+            "stages": {name: s.summary(started_at) for name, s in self.stages.items()},
+            "failed_chunks": [{"url": c["url"], "chunk_index": c["chunk_index"], "sources": c["sources"]}
+                              for c in self.failed],
+        }
+
+
+def load_urls(path):
+    """One URL per line; blank lines and '#' comments are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scrape, chunk, embed and store a course and build its graph as one streaming pipeline.")
+    parser.add_argument("--urls", help="File with one page URL per line (default: the list in scrape.py)")
+    parser.add_argument("--course", default=COURSE_ID, help="Vector DB partition the chunks are stored under")
+    parser.add_argument("--db", default=VECTOR_DB_PATH)
+    parser.add_argument("--working-dir", default=WORKING_DIR, help="GraphRAG working dir")
+    parser.add_argument("--skip-graph", action="store_true", help="Only fill the vector DB")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep near-duplicate chunks")
+    parser.add_argument("--replace", action="store_true", help="Delete the course's stored chunks first")
+    parser.add_argument("--report", help="Write the per-stage counters as JSON")
+    args = parser.parse_args()
+
+    pipeline = IngestPipeline(
+        load_urls(args.urls) if args.urls else DEFAULT_URLS,
+        course_id=args.course,
+        db_path=args.db,
+        working_dir=args.working_dir,
+        build_graph=not args.skip_graph,
+        dedupe=not args.no_dedupe,
+        replace=args.replace,
+    )
+    report = asyncio.run(pipeline.run())
+
+    print(f"\nCourse '{report['course_id']}': {report['pages']} pages, {report['chunks_stored']} chunks stored "
+          f"({report['duplicate_chunks']} duplicates dropped) in {report['total_secs']}s")
+    for name, stage in report["stages"].items():
+        print(f"  {name:<8} {stage['items_in']:>6} in  {stage['items_out']:>6} out  {stage['errors']:>4} errors  "
+              f"{stage['items_per_sec']:>8}/s  utilization {stage['utilization']:>5}  "
+              f"done after {stage['finished_after_secs']}s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.report}")
+
+    if report["chunks_failed"]:
+        print(f"\n{report['chunks_failed']} chunk(s) could not be embedded or stored; "
+              f"re-run with --replace to ingest the course completely:")
+        for chunk in report["failed_chunks"]:
+            print(f"  {chunk['url']} #{chunk['chunk_index']} (also on {len(chunk['sources']) - 1} other page(s))")
+        sys.exit(1)
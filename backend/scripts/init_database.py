@@ -1,27 +1,120 @@
+import os
+import sys
+import json
 import sqlite3
+import argparse
 import sqlite_vec
 
-DB_PATH = "vector.db"
+from ingest_config import VECTOR_DB_PATH
 
-conn = sqlite3.connect(DB_PATH)
+DB_PATH = VECTOR_DB_PATH
+DEFAULT_COURSE = "default"
+COPY_BATCH_SIZE = 1000
 
-conn.enable_load_extension(True)
-sqlite_vec.load(conn)
-conn.enable_load_extension(False)
-
-cur = conn.cursor()
-
-cur.execute("""
+# course_id is a partition key: a KNN query with "course_id = ?" only scans that course's vectors.
+# source is a metadata column, so KNN queries can filter on it; '+' columns are stored, not filtered on.
+# document_sources indexes every provenance URL of a chunk (its page and the pages of the
+# near-duplicates merged into it), since the '+sources' column cannot be filtered on.
+SCHEMA = """
 CREATE VIRTUAL TABLE IF NOT EXISTS documents USING vec0(
     id INTEGER PRIMARY KEY,
+    course_id TEXT partition key,
     source TEXT,
-    chunk_index INT,
-    chunk_text TEXT,
-    embedding FLOAT[1536]
+    chunk_index INTEGER,
+    +chunk_text TEXT,
+    +sources TEXT,
+    embedding FLOAT[1536] distance_metric=cosine
 );
-""")
+CREATE TABLE IF NOT EXISTS document_sources (
+    source TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (source, document_id)
+) WITHOUT ROWID;
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+    conn.enable_load_extension(False)
+    return conn
+
+
+def needs_migration(conn):
+    """Whether the documents table exists with the old schema (no course partition or sources column)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    return bool(columns) and not {"course_id", "sources"} <= columns
+
+
+def add_sources(cur, document_id, urls):
+    """Indexes a chunk under each of its provenance URLs."""
+    cur.executemany("INSERT OR IGNORE INTO document_sources (source, document_id) VALUES (?, ?)",
+                    [(url, document_id) for url in urls])
+
+
+def index_sources(conn):
+    """Fills document_sources from the stored rows (databases written before it existed)."""
+    cur = conn.cursor()
+    rows = conn.execute("SELECT id, source, sources FROM documents").fetchall()
+    for document_id, source, sources in rows:
+        add_sources(cur, document_id, {source, *json.loads(sources or "[]")} - {None})
+    conn.commit()
+    return len(rows)
+
+
+def migrate(path, course_id=DEFAULT_COURSE):
+    """
+    Copies a database with the old unpartitioned documents table into the new
+    schema (every row assigned to course_id), then replaces the old file.
+    """
+    new_path = path + ".new"
+    if os.path.exists(new_path):
+        os.remove(new_path)
+    old, new = connect(path), connect(new_path)
+    new.executescript(SCHEMA)
+
+    copied = 0
+    rows = old.execute("SELECT id, source, chunk_index, chunk_text, embedding FROM documents")
+    while True:
+        batch = rows.fetchmany(COPY_BATCH_SIZE)
+        if not batch:
+            break
+        new.executemany("""
+            INSERT INTO documents (id, course_id, source, chunk_index, chunk_text, sources, embedding)
+            VALUES (?, ?, ?, ?, ?, NULL, ?)
+        """, [(id_, course_id, source, chunk_index, text, embedding)
+              for id_, source, chunk_index, text, embedding in batch])
+        copied += len(batch)
+    new.commit()
+    index_sources(new)
+    old.close()
+    new.close()
+    os.replace(new_path, path)
+    return copied
+
 
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the vector database (or migrate an unpartitioned one).")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--migrate", action="store_true",
+                        help="Copy an existing unpartitioned documents table into the partitioned schema.")
+    parser.add_argument("--course", default=DEFAULT_COURSE, help="Course ID given to migrated rows.")
+    args = parser.parse_args()
 
-print("Vector database initialized!")
+    if args.migrate:
+        count = migrate(args.db, args.course)
+        print(f"Migrated {count} chunks into course '{args.course}'.")
+    else:
+        conn = connect(args.db)
+        if needs_migration(conn):
+            conn.close()
+            print(f"ERROR: {args.db} has the old documents schema. "
+                  f"Run: python init_database.py --migrate --course <course_id>")
+            sys.exit(1)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        # Re-running on an existing database indexes the provenance URLs of its rows
+        indexed = index_sources(conn)
+        conn.close()
+        print(f"Vector database initialized! ({indexed} chunks indexed by source)")
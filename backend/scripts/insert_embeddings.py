@@ -3,8 +3,10 @@ import json
 import sqlite3
 import sqlite_vec
 
-DB_PATH = "backend/data/vector.db"
-EMBED_DIR = "embeddings"
+from ingest_config import VECTOR_DB_PATH, EMBED_DIR, COURSE_ID
+from init_database import add_sources
+
+DB_PATH = VECTOR_DB_PATH
 
 # Connect
 conn = sqlite3.connect(DB_PATH)
@@ -31,14 +33,17 @@ for filename in os.listdir(EMBED_DIR):
         chunk_index = chunk["chunk_index"]
         chunk_text = chunk["text"]
         embedding = chunk["embedding"]
+        # Provenance URLs of the near-duplicate copies merged into this chunk (dedupe_chunks.py)
+        sources = chunk.get("sources", [url])
 
         # Convert embedding list to sqlite_vec vector
         embedding_bytes = sqlite_vec.serialize_float32(embedding)  # note lowercase 'vector'
 
         cur.execute("""
-            INSERT INTO documents (source, chunk_index, chunk_text, embedding)
-            VALUES (?, ?, ?, ?)
-        """, (url, chunk_index, chunk_text, embedding_bytes))
+            INSERT INTO documents (course_id, source, chunk_index, chunk_text, sources, embedding)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (COURSE_ID, url, chunk_index, chunk_text, json.dumps(sources), embedding_bytes))
+        add_sources(cur, cur.lastrowid, {url, *sources})
 
 conn.commit()
 conn.close()
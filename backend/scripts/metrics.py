@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("erica.metrics")
+
+# Latency buckets in seconds (LLM calls dominate the upper range)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + inner + "}"
+
+
+class Counter:
+    """Monotonic counter, one value per label set."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {} # label key -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(key + (("le", bound),))
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+# --- METRICS REGISTRY ---
+STAGE_SECONDS = Histogram("erica_stage_seconds", "Time spent in each stage of an /ask request.")
+REQUESTS_TOTAL = Counter("erica_requests_total", "Tutor requests by endpoint and HTTP status.")
+TOKENS_TOTAL = Counter("erica_tokens_total", "Tokens processed, by kind (context, prompt, cached_prompt, completion).")
+CACHE_TOTAL = Counter("erica_cache_requests_total", "Cache lookups by cache name and result (hit/miss).")
+CONTEXT_DROPPED_TOTAL = Counter("erica_context_dropped_items_total", "Context items dropped by the token budget.")
+COALESCED_TOTAL = Counter("erica_coalesced_requests_total", "Requests that shared an identical in-flight computation, by stage.")
+
+REGISTRY = [STAGE_SECONDS, REQUESTS_TOTAL, TOKENS_TOTAL, CACHE_TOTAL, CONTEXT_DROPPED_TOTAL, COALESCED_TOTAL]
+
+
+def render_metrics():
+    """Prometheus text exposition format for every registered metric."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """
+    Collects timing spans for one request. Every span is also observed in
+    STAGE_SECONDS, and the whole trace is logged as a single line at the end.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans = {}
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def finish(self, status):
+        self.record("total", time.perf_counter() - self.started)
+        REQUESTS_TOTAL.inc(endpoint=self.endpoint, status=status)
+        summary = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.spans.items())
+        logger.info("%s status=%s %s", self.endpoint, status, summary)
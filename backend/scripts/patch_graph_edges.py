@@ -1,17 +1,25 @@
 import networkx as nx
 import json
 import os
+import sys
 import asyncio
+import argparse
 from tqdm.asyncio import tqdm_asyncio
 from dotenv import load_dotenv
 from openai import AsyncOpenAI, RateLimitError, APIError
+from graph_store import GRAPH_DB_PATH, unclassified_edges, update_relationship_types
+from ingest_config import GRAPH_PATH
 
 # --- CONFIGURATION ---
 load_dotenv()
 API_KEY = os.getenv("OPENAI_API_KEY")
 INPUT_GRAPH_PATH = "/home/yugp/projects/EricaAITutor/backend/data/graph_edge_rework.graphml"
-OUTPUT_GRAPH_PATH = "knowledge_graph_classified.graphml"
+OUTPUT_GRAPH_PATH = GRAPH_PATH
 BACKUP_FILE_PATH = "classifications_backup.json" # New backup file
+# With --store (or GRAPH_BACKEND=sqlite, as for the server) labels are read from and written to the
+# SQLite graph store in place. Otherwise the GraphML file is rewritten; the default server and
+# compaction, sharding and community reports read that file.
+USE_GRAPH_STORE = os.getenv("GRAPH_BACKEND", "networkx").lower() == "sqlite"
 MODEL_NAME = "gpt-4o-mini"
 # RATE LIMIT CONFIG
 # Target: ~400 RPM (Safety Buffer for 500 RPM limit)
@@ -190,6 +198,62 @@ async def process_graph():
     print(f"--- Finished! Processed {edges_modified} edges. ---")
     nx.write_graphml(G, OUTPUT_GRAPH_PATH)
     print(f"Graph saved to: {OUTPUT_GRAPH_PATH}")
+    if os.path.exists(GRAPH_DB_PATH):
+        print(f"WARNING: {GRAPH_DB_PATH} still has the old labels; re-run graph_store.py to rebuild it.")
+
+async def process_store():
+    if not API_KEY:
+        print("ERROR: OPENAI_API_KEY not found.")
+        return
+
+    client = AsyncOpenAI(api_key=API_KEY)
+
+    print(f"--- Reading unclassified edges from {GRAPH_DB_PATH} ---")
+    edges_to_process = []
+    evidence_results = []
+    for u, v, description in unclassified_edges(GRAPH_DB_PATH):
+        clean_u = clean_node_id(u)
+        clean_v = clean_node_id(v)
+
+        # Heuristic for Chunks
+        if "chunk" in clean_u.lower() or "chunk" in clean_v.lower() or "chunk-" in description:
+            evidence_results.append((u, v, "EVIDENCE"))
+            continue
+        edges_to_process.append((u, v, clean_u, clean_v, description))
+
+    print(f"To Classify: {len(edges_to_process)} | Chunk edges: {len(evidence_results)}")
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def rate_limited_task(u, v, c_u, c_v, desc, delay_steps):
+        await asyncio.sleep(LAUNCH_DELAY * delay_steps)
+        classification = await classify_edge_async(client, c_u, c_v, desc, semaphore)
+        return (u, v, classification)
+
+    tasks = [
+        asyncio.create_task(rate_limited_task(u, v, c_u, c_v, desc, index))
+        for index, (u, v, c_u, c_v, desc) in enumerate(edges_to_process)
+    ]
+    results = await tqdm_asyncio.gather(*tasks, desc="Classifying AI Edges")
+
+    print(f"\nSaving backup to {BACKUP_FILE_PATH}...")
+    with open(BACKUP_FILE_PATH, "w") as f:
+        json.dump(results, f)
+
+    update_relationship_types(evidence_results + list(results), GRAPH_DB_PATH)
+    print(f"--- Finished! Updated {len(evidence_results) + len(results)} edges in place. ---")
+    print(f"NOTE: {OUTPUT_GRAPH_PATH} keeps its old labels; only GRAPH_BACKEND=sqlite servers see the new ones.")
 
 if __name__ == "__main__":
-    asyncio.run(process_graph())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Classify the relationship type of every unlabelled graph edge.")
+    parser.add_argument("--store", action="store_true", default=USE_GRAPH_STORE,
+                        help=f"Update {os.path.basename(GRAPH_DB_PATH)} in place instead of the GraphML file")
+    args = parser.parse_args()
+
+    if args.store:
+        if not os.path.exists(GRAPH_DB_PATH):
+            print(f"ERROR: {GRAPH_DB_PATH} not found; build it with graph_store.py first.")
+            sys.exit(1)
+        asyncio.run(process_store())
+    else:
+        asyncio.run(process_graph())
\ No newline at end of file
@@ -4,6 +4,8 @@ import os
 import json
 import re
 
+from ingest_config import SCRAPED_DIR, FETCH_TIMEOUT, CHUNK_SIZE, CHUNK_OVERLAP
+
 # List of URLs to scrape
 urls = [
     "https://pantelis.github.io/aiml-common/lectures/learning-problem/",
@@ -79,8 +81,7 @@ urls = [
 ]
 
 
-output_dir = "scraped_json"
-os.makedirs(output_dir, exist_ok=True)
+output_dir = SCRAPED_DIR
 
 # ---------- Helper functions ----------
 def clean_html(html: str) -> str:
@@ -91,7 +92,7 @@ def clean_html(html: str) -> str:
     text = re.sub(r"\n+", "\n", text).strip()
     return text
 
-def chunk_text(text: str, chunk_size=800, overlap=200):
+def chunk_text(text: str, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     words = text.split()
     chunks = []
     start = 0
@@ -103,30 +104,33 @@ def chunk_text(text: str, chunk_size=800, overlap=200):
     return chunks
 
 # ---------- Scrape and save ----------
-for url in urls:
-    try:
-        print(f"Scraping: {url}")
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        raw_html = r.text
+if __name__ == "__main__":
+    os.makedirs(output_dir, exist_ok=True)
+
+    for url in urls:
+        try:
+            print(f"Scraping: {url}")
+            r = requests.get(url, timeout=FETCH_TIMEOUT)
+            r.raise_for_status()
+            raw_html = r.text
 
-        text = clean_html(raw_html)
-        chunks = chunk_text(text)
+            text = clean_html(raw_html)
+            chunks = chunk_text(text)
 
-        # Save as JSON
-        filename = url.rstrip("/").split("/")[-1]
-        if filename == "":
-            filename = "index"
-        filepath = os.path.join(output_dir, f"{filename}.json")
+            # Save as JSON
+            filename = url.rstrip("/").split("/")[-1]
+            if filename == "":
+                filename = "index"
+            filepath = os.path.join(output_dir, f"{filename}.json")
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump({
-                "url": url,
-                "text": text,
-                "chunks": chunks
-            }, f, ensure_ascii=False, indent=2)
+            with open(filepath, "w", encoding="utf-8") as f:
+                json.dump({
+                    "url": url,
+                    "text": text,
+                    "chunks": chunks
+                }, f, ensure_ascii=False, indent=2)
 
-        print(f"Saved → {filepath}, {len(chunks)} chunks")
+            print(f"Saved → {filepath}, {len(chunks)} chunks")
 
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
@@ -0,0 +1,79 @@
+import time
+import threading
+
+# --- CONFIGURATION ---
+MAX_HISTORY_TOKENS = 24000  # Conversation history kept per session (contexts + questions + answers):
+                            # a first turn (~6k) plus several follow-ups
+TRIM_TO_FRACTION = 0.6      # Once over budget, old turns are dropped down to this share of it
+SESSION_TTL_SECONDS = 3600  # Idle sessions are dropped after this
+MAX_SESSIONS = 1000
+
+
+class Session:
+    """
+    Conversation state for one student.
+
+    The history is append-only so each turn's prompt starts with exactly the
+    previous turn's prompt (provider-side prefix caching). Every turn remembers
+    which graph nodes and passages it introduced, so follow-ups only send new
+    context, and trimming an old turn makes its nodes eligible again.
+
+    Trimming changes the prefix, so it is done rarely and in one step: only
+    when the history exceeds the budget, and then down to TRIM_TO_FRACTION of
+    it, leaving room for several cache-friendly turns before the next trim.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.turns = [] # [{"messages": [...], "nodes": set, "passages": set, "tokens": int}]
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+    def history(self):
+        messages = []
+        for turn in self.turns:
+            messages.extend(turn["messages"])
+        return messages
+
+    def known_nodes(self):
+        return set().union(*(turn["nodes"] for turn in self.turns))
+
+    def known_passages(self):
+        return set().union(*(turn["passages"] for turn in self.turns))
+
+    def add_turn(self, messages, nodes, passages, tokens, max_tokens=MAX_HISTORY_TOKENS):
+        self.turns.append({"messages": messages, "nodes": set(nodes),
+                           "passages": set(passages), "tokens": tokens})
+        # Drop the oldest turns once over budget (always keep the latest one)
+        if sum(t["tokens"] for t in self.turns) > max_tokens:
+            while len(self.turns) > 1 and sum(t["tokens"] for t in self.turns) > max_tokens * TRIM_TO_FRACTION:
+                self.turns.pop(0)
+        self.last_used = time.time()
+
+
+class SessionStore:
+    """In-memory sessions keyed by session ID, with idle expiry."""
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        """Returns the session for this ID, creating it if it is new or expired."""
+        now = time.time()
+        with self.lock:
+            expired = [sid for sid, s in self.sessions.items() if now - s.last_used > self.ttl]
+            for sid in expired:
+                del self.sessions[sid]
+
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= self.max_sessions:
+                    oldest = min(self.sessions.values(), key=lambda s: s.last_used)
+                    del self.sessions[oldest.session_id]
+                session = Session(session_id)
+                self.sessions[session_id] = session
+            session.last_used = now
+            return session
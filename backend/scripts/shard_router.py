@@ -0,0 +1,222 @@
+import os
+import json
+import argparse
+import itertools
+import threading
+from collections import OrderedDict
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask, Response, request, jsonify
+from flask_cors import CORS
+
+from concept_index import ConceptIndex
+from shards import SHARD_TABLE_PATH, load_shard_table
+from metrics import Counter, REGISTRY, RequestTrace, render_metrics
+
+app = Flask(__name__)
+CORS(app)
+
+# --- CONFIGURATION ---
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("erica.router")
+
+BASE_PORT = 5001            # Shard i listens on BASE_PORT + i unless --urls says otherwise
+UPSTREAM_TIMEOUT = 300      # Seconds (generation can be slow)
+MAX_ROUTED_SESSIONS = 10000 # Least recently used sessions are forgotten beyond this
+MAX_BATCH_SIZE = 500        # Same limit as the shards' /ask/batch (userinput.py), checked before splitting
+
+SHARD_REQUESTS_TOTAL = Counter("erica_shard_requests_total", "Questions routed to each shard.")
+REGISTRY.append(SHARD_REQUESTS_TOTAL)
+
+
+class ShardRouter:
+    """
+    Maps a question to the shard owning its concept. Only node names are kept
+    (from the routing table), never the graph itself. Each shard can have
+    several replicas, used round-robin, so hot topics scale on their own.
+
+    Session history lives in the memory of one server process, so a session is
+    pinned to one replica of one shard and stays there while the shard has the
+    concepts it asks about (owned or in its halo).
+    """
+
+    def __init__(self, table, shard_urls):
+        self.owners = table["owners"]
+        self.halos = {shard: set(nodes) for shard, nodes in table.get("halos", {}).items()}
+        self.index = ConceptIndex(self.owners.keys())
+        self.replicas = {shard: itertools.cycle(urls) for shard, urls in shard_urls.items()}
+        self.fallback = itertools.cycle(sorted(shard_urls))
+        self.sessions = OrderedDict() # session_id -> (shard, replica URL), least recently used first
+        self.lock = threading.Lock()
+
+    def has_node(self, shard, node):
+        return str(self.owners[node]) == shard or node in self.halos.get(shard, ())
+
+    def shard_for(self, question, session_id=None):
+        """
+        The session's shard if it has the matched concept (or none matched); else
+        the concept's owner; else round-robin. A session that moves to another
+        shard starts a new history there.
+        """
+        node = self.index.lookup(question)
+        with self.lock:
+            route = self.sessions.get(session_id) if session_id else None
+            if route is not None and (node is None or self.has_node(route[0], node)):
+                shard = route[0]
+                self.sessions.move_to_end(session_id)
+            else:
+                shard = str(self.owners[node]) if node is not None else next(self.fallback)
+                if session_id:
+                    if route is not None:
+                        logger.info("Session %s moves from shard %s to %s for %s; its history stays behind",
+                                    session_id, route[0], shard, node)
+                    self.sessions[session_id] = (shard, next(self.replicas[shard]))
+                    self.sessions.move_to_end(session_id)
+                    while len(self.sessions) > MAX_ROUTED_SESSIONS:
+                        self.sessions.popitem(last=False)
+        SHARD_REQUESTS_TOTAL.inc(shard=shard)
+        return shard, node
+
+    def url_for(self, shard, session_id=None):
+        """The replica a session is pinned to; else the shard's next replica."""
+        with self.lock:
+            route = self.sessions.get(session_id) if session_id else None
+            if route is not None and route[0] == shard:
+                return route[1]
+            return next(self.replicas[shard])
+
+
+router = None
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@app.route("/ask", methods=["POST"])
+def route_ask():
+    trace = RequestTrace("/router/ask")
+    data = request.get_json()
+    if not data or "question" not in data:
+        trace.finish(400)
+        return jsonify({"error": "Missing 'question' in request body"}), 400
+
+    with trace.span("route"):
+        session_id = str(data["session_id"]) if data.get("session_id") else None
+        shard, node = router.shard_for(str(data["question"]), session_id)
+        url = router.url_for(shard, session_id)
+    logger.info("Routing %r (concept %s) to shard %s at %s", data["question"], node, shard, url)
+
+    try:
+        with trace.span("upstream"):
+            upstream = requests.post(f"{url}/ask", json=data, timeout=UPSTREAM_TIMEOUT)
+    except requests.RequestException as e:
+        logger.error("Shard %s at %s is unavailable: %s", shard, url, e)
+        trace.finish(502)
+        return f"Shard {shard} is unavailable.", 502, {"Content-Type": "text/plain; charset=utf-8"}
+
+    headers = {k: v for k, v in upstream.headers.items() if k in ("Content-Type", "X-Session-Id")}
+    trace.finish(upstream.status_code)
+    return upstream.content, upstream.status_code, headers
+
+
+@app.route("/ask/batch", methods=["POST"])
+def route_batch():
+    """
+    Splits a batch by shard, forwards each part concurrently and streams the
+    merged NDJSON back in input order. Every other field of the request body
+    (course_id, ...) is forwarded with each part.
+    """
+    trace = RequestTrace("/router/ask/batch")
+    data = request.get_json()
+    questions = data.get("questions") if data else None
+    if not isinstance(questions, list) or not questions:
+        trace.finish(400)
+        return jsonify({"error": "Missing 'questions' list in request body"}), 400
+    if len(questions) > MAX_BATCH_SIZE:
+        trace.finish(400)
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} questions per batch"}), 400
+
+    parts = {} # shard -> original indexes
+    with trace.span("route"):
+        for i, question in enumerate(questions):
+            shard, _ = router.shard_for(str(question))
+            parts.setdefault(shard, []).append(i)
+
+    results = [None] * len(questions)
+    ready = [threading.Event() for _ in questions]
+
+    def forward(shard, indexes):
+        failure = (502, f"Shard {shard} is unavailable.")
+        try:
+            upstream = requests.post(f"{router.url_for(shard)}/ask/batch",
+                                     json=dict(data, questions=[questions[i] for i in indexes]),
+                                     timeout=UPSTREAM_TIMEOUT, stream=True)
+            if upstream.status_code != 200:
+                # A rejected part (unknown course, ...) reports the shard's own error
+                try:
+                    failure = (upstream.status_code, upstream.json()["error"])
+                except (ValueError, KeyError, TypeError):
+                    pass
+                raise requests.RequestException(f"HTTP {upstream.status_code}")
+            for line in upstream.iter_lines():
+                if line:
+                    result = json.loads(line)
+                    index = indexes[result["index"]]
+                    result["index"] = index
+                    results[index] = result
+                    ready[index].set()
+        except (requests.RequestException, ValueError) as e:
+            logger.error("Batch part for shard %s failed: %s", shard, e)
+        finally:
+            # Anything the shard did not answer is reported as failed
+            for index in indexes:
+                if results[index] is None:
+                    results[index] = {"index": index, "question": questions[index],
+                                      "status": failure[0], "error": failure[1]}
+                ready[index].set()
+
+    pool = ThreadPoolExecutor(max_workers=len(parts))
+    for shard, indexes in parts.items():
+        pool.submit(forward, shard, indexes)
+
+    def stream_results():
+        try:
+            for index in range(len(questions)):
+                ready[index].wait()
+                yield json.dumps(results[index]) + "\n"
+        finally:
+            pool.shutdown(wait=False)
+            trace.finish(200)
+
+    return Response(stream_results(), mimetype="application/x-ndjson")
+
+
+def default_shard_urls(num_shards, base_port=BASE_PORT):
+    return {str(i): [f"http://localhost:{base_port + i}"] for i in range(num_shards)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route /ask requests to the shard owning the question's concept.")
+    parser.add_argument("--table", default=SHARD_TABLE_PATH, help="Routing table written by shards.py")
+    parser.add_argument("--urls", help='JSON file {"<shard>": ["http://host:port", ...]} (replicas per shard)')
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    table = load_shard_table(args.table)
+    if args.urls:
+        with open(args.urls, "r", encoding="utf-8") as f:
+            shard_urls = json.load(f)
+    else:
+        shard_urls = default_shard_urls(table["num_shards"], args.base_port)
+
+    router = ShardRouter(table, shard_urls)
+    logger.info("Routing %d concepts over %d shards", len(table["owners"]), len(shard_urls))
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,130 @@
+import os
+import json
+import argparse
+from collections import Counter, defaultdict
+
+import networkx as nx
+
+from ingest_config import DATA_DIR, default_graph_path
+
+# --- CONFIGURATION ---
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+SHARD_TABLE_PATH = os.path.join(SHARD_DIR, "shards.json")
+
+NUM_SHARDS = 4
+HALO_HOPS = 2          # Neighbourhood of the owned nodes copied into each shard
+SHARD_LEVEL = 0        # Leiden level whose clusters are the unit of placement
+UNCLUSTERED = "unclustered"
+
+
+def shard_graph_path(shard_id, shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, f"shard_{shard_id}.graphml")
+
+
+def load_shard_table(path=SHARD_TABLE_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def node_cluster(data, level=SHARD_LEVEL):
+    """Cluster id of a node at the given Leiden level, or None."""
+    try:
+        memberships = json.loads(data.get("clusters", "[]"))
+    except json.JSONDecodeError:
+        return None
+    for membership in memberships:
+        if membership["level"] == level:
+            return str(membership["cluster"])
+    return None
+
+
+def group_by_cluster(G, level=SHARD_LEVEL):
+    """
+    Nodes per cluster. A node without a cluster at this level joins the most
+    common cluster among its neighbours, so it is placed next to its topic.
+    The remaining ones (small components Leiden left out) are grouped per
+    connected component, so they can be spread over the shards.
+    """
+    clusters = {node: node_cluster(data, level) for node, data in G.nodes(data=True)}
+    groups = defaultdict(list)
+    leftover = []
+    for node, cluster in clusters.items():
+        if cluster is None:
+            neighbour_clusters = Counter(clusters[n] for n in G.neighbors(node) if clusters[n] is not None)
+            if not neighbour_clusters:
+                leftover.append(node)
+                continue
+            cluster = neighbour_clusters.most_common(1)[0][0]
+        groups[cluster].append(node)
+
+    for i, component in enumerate(nx.connected_components(G.subgraph(leftover).to_undirected())):
+        groups[f"{UNCLUSTERED}-{i}"] = list(component)
+    return groups
+
+
+def assign_shards(groups, num_shards):
+    """Greedy balance by node count: largest cluster first, onto the lightest shard."""
+    shards = [{"clusters": [], "owned": []} for _ in range(num_shards)]
+    for cluster, members in sorted(groups.items(), key=lambda item: len(item[1]), reverse=True):
+        lightest = min(shards, key=lambda shard: len(shard["owned"]))
+        lightest["clusters"].append(cluster)
+        lightest["owned"].extend(members)
+    return shards
+
+
+def with_halo(G, owned, hops=HALO_HOPS):
+    """Owned nodes plus every node within `hops` edges of them."""
+    nodes = set(owned)
+    frontier = set(owned)
+    for _ in range(hops):
+        frontier = {n for node in frontier for n in G.neighbors(node)} - nodes
+        nodes |= frontier
+    return nodes
+
+
+def build_shards(G, num_shards=NUM_SHARDS, hops=HALO_HOPS, shard_dir=SHARD_DIR):
+    """
+    Writes one GraphML file per shard (owned clusters + halo) and the routing
+    table mapping every node to the shard that owns it, plus the halo nodes of
+    each shard (so the router can keep a session on a shard that has a concept).
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = assign_shards(group_by_cluster(G), num_shards)
+
+    table = {"num_shards": num_shards, "halo_hops": hops, "shards": {}, "owners": {}, "halos": {}}
+    for shard_id, shard in enumerate(shards):
+        nodes = with_halo(G, shard["owned"], hops)
+        path = shard_graph_path(shard_id, shard_dir)
+        nx.write_graphml(G.subgraph(nodes), path)
+
+        table["shards"][str(shard_id)] = {
+            "clusters": [c for c in shard["clusters"] if not c.startswith(UNCLUSTERED)],
+            "owned_nodes": len(shard["owned"]),
+            "halo_nodes": len(nodes) - len(shard["owned"]),
+            "path": os.path.basename(path),
+        }
+        for node in shard["owned"]:
+            table["owners"][node] = shard_id
+        table["halos"][str(shard_id)] = sorted(nodes - set(shard["owned"]))
+
+    with open(os.path.join(shard_dir, os.path.basename(SHARD_TABLE_PATH)), "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the knowledge graph into topic-cluster shards.")
+    parser.add_argument("--input", default=default_graph_path())
+    parser.add_argument("--shards", type=int, default=NUM_SHARDS)
+    parser.add_argument("--halo", type=int, default=HALO_HOPS, help="Hops of neighbouring nodes copied into each shard")
+    parser.add_argument("--output-dir", default=SHARD_DIR)
+    args = parser.parse_args()
+
+    print(f"--- Loading Graph from {args.input} ---")
+    G = nx.read_graphml(args.input)
+
+    table = build_shards(G, args.shards, args.halo, args.output_dir)
+    for shard_id, shard in table["shards"].items():
+        print(f"Shard {shard_id}: {len(shard['clusters'])} clusters, "
+              f"{shard['owned_nodes']} owned + {shard['halo_nodes']} halo nodes -> {shard['path']}")
+    print(f"Routing table saved to: {os.path.join(args.output_dir, os.path.basename(SHARD_TABLE_PATH))}")
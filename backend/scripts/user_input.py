@@ -1,45 +1,84 @@
 import os
 import sqlite3
+import threading
 import sqlite_vec
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from ingest_config import VECTOR_DB_PATH, EMBED_MODEL
+
 load_dotenv()
 # --- Configuration ---
-DB_PATH = "vector.db"
+DB_PATH = VECTOR_DB_PATH # Questions are embedded with the same model as the stored chunks
 TOP_K = 3  # number of top chunks to retrieve
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Connect to SQLite and enable vector extension
-conn = sqlite3.connect(DB_PATH)
-conn.enable_load_extension(True)
-sqlite_vec.load(conn)
-conn.enable_load_extension(False)
-cur = conn.cursor()
+# One SQLite connection per thread and database (the tutor server queries from a thread pool)
+_local = threading.local()
+
+
+def get_connection(db_path=DB_PATH):
+    """Connect to SQLite and enable the vector extension (once per thread and database)."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        # sqlite3.connect would silently create an empty database
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Vector database not found at {db_path}")
+        conn = sqlite3.connect(db_path)
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+        connections[db_path] = conn
+    return conn
+
+
+def has_source_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_sources'").fetchone() is not None
 
 
-def get_top_chunks(question, top_k=TOP_K):
+def get_top_chunks(question, top_k=TOP_K, db_path=DB_PATH, course_id=None, source=None):
     """
     Embed the user question and retrieve the top_k most similar chunks.
+    course_id restricts the KNN search to that course's partition, source to
+    the chunks of one page/lecture URL, including chunks deduplicated into
+    another page (document_sources).
+    Returns a list of (id, source, chunk_text, score) rows, closest first.
     """
+    # Open the database first: a missing one should not cost an embedding request
+    conn = get_connection(db_path)
+
     # 1. Embed the question
     response = client.embeddings.create(
-        model="text-embedding-3-small",
+        model=EMBED_MODEL,
         input=question
     )
     question_vector = response.data[0].embedding
 
-    # 2. Query SQLite for closest vectors using cosine similarity
-    cur.execute("""
-        SELECT id, vec_distance_cosine(embedding, ?) AS score
+    # 2. KNN query (cosine distance) over the partition / filtered rows only
+    filters, params = "", [sqlite_vec.serialize_float32(question_vector), top_k]
+    if course_id is not None:
+        filters += " AND course_id = ?"
+        params.append(course_id)
+    if source is not None:
+        if has_source_index(conn):
+            filters += " AND id IN (SELECT document_id FROM document_sources WHERE source = ?)"
+        else:
+            filters += " AND source = ?" # Database predating document_sources: canonical page only
+        params.append(source)
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, source, chunk_text, distance AS score
         FROM documents
-        ORDER BY score ASC
-        LIMIT ?;
-    """, (sqlite_vec.serialize_float32(question_vector), TOP_K))
-
-
+        WHERE embedding MATCH ? AND k = ?{filters}
+        ORDER BY distance;
+    """, params)
 
     return cur.fetchall()
 
@@ -54,15 +93,15 @@ def answer_question(question):
         return "Sorry, I couldn't find relevant information."
 
     # Build context
-    context_text = "\n\n".join([f"Source: {src}\n{txt}" for src, txt in top_chunks])
+    context_text = "\n\n".join([f"Source: {src}\n{txt}" for _, src, txt, _ in top_chunks])
 
     # Prompt GPT with context + user question
     prompt = f"""
     You are a helpful assistant. Use the following context to answer the question.
-    
+
     Context:
     {context_text}
-    
+
     Question: {question}
     Answer:
     """
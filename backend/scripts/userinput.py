@@ -1,13 +1,29 @@
 import os
+import atexit
+import re
+import hashlib
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import networkx as nx
 import logging
 from dotenv import load_dotenv
 from openai import OpenAI 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from markdown import markdown
 
-
+import user_input as vector_store
+from ingest_config import WORKING_DIR, count_tokens, default_graph_path
+from sessions import SessionStore
+from graph_store import GraphStore, GRAPH_DB_PATH
+from graph_traversal import get_pedagogical_subgraph
+from shards import shard_graph_path
+from courses import Course, DEFAULT_COURSE, load_registry
+from singleflight import SingleFlight
+from community_reports import is_broad_question, is_cluster_title, select_reports, format_reports
+from metrics import RequestTrace, TOKENS_TOTAL, CACHE_TOTAL, CONTEXT_DROPPED_TOTAL, COALESCED_TOTAL, render_metrics
 
 
 app = Flask(__name__)
@@ -15,278 +31,589 @@ CORS(app)
 
 # CONFIGURATION 
 load_dotenv()
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("erica.tutor")
 client = OpenAI() # Uses OPENAI_API_KEY from .env
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-BACKEND_ROOT = os.path.dirname(SCRIPT_DIR)
-WORKING_DIR = os.path.join(BACKEND_ROOT, "data", "erica_graph_storage")
-GRAPH_PATH = os.path.join(BACKEND_ROOT, "data", "knowledge_graph_classified.graphml")
+# Prefer the graph with compacted node descriptions (see compact_descriptions.py)
+GRAPH_PATH = default_graph_path()
+
+# Sharded serving: this process only loads its topic clusters plus their halo (see shards.py)
+GRAPH_SHARD = os.getenv("GRAPH_SHARD")
+if GRAPH_SHARD is not None:
+    GRAPH_PATH = shard_graph_path(GRAPH_SHARD)
+
+# "networkx" holds the whole graph in memory; "sqlite" queries the graph store built by graph_store.py
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "networkx").lower()
+GRAPH_SOURCE = GRAPH_DB_PATH if GRAPH_BACKEND == "sqlite" else GRAPH_PATH
+
+# "pagerank" picks context nodes by personalized PageRank (context_ranker.py); "traversal" uses the
+# hand-written neighbour rules below. The sqlite backend always uses its indexed traversal queries.
+CONTEXT_RANKING = os.getenv("CONTEXT_RANKING", "pagerank").lower()
+
+# Upper bound on the context subgraph sent to the LLM (measured with tiktoken)
+MAX_CONTEXT_TOKENS = 3000
+FOLLOWUP_CONTEXT_TOKENS = 1500 # Follow-ups in a session already carry earlier context
+
+# Hybrid retrieval: passages from the vector DB and the graph's evidence chunks
+VECTOR_TOP_K = 3
+MAX_GRAPH_CHUNKS = 3
+MAX_PASSAGE_TOKENS = 2500
+DUPLICATE_OVERLAP = 0.8  # Passages sharing this fraction of words are treated as the same text
+
+# Graph matching and vector search run side by side for every request
+retrieval_pool = ThreadPoolExecutor(max_workers=8)
+
+# Broad questions are answered from the precomputed community reports (community_reports.py)
+COMMUNITY_CONTEXT_TOKENS = 2000
+
+# Conversation sessions for /ask requests that carry a 'session_id'
+sessions = SessionStore()
+
+# Batch endpoint: upper bound on questions per call and concurrent LLM generations per batch
+MAX_BATCH_SIZE = 500
+BATCH_CONCURRENCY = 8
+
+# Identical requests in flight at the same time (e.g. a whole class right after a lecture)
+# share one subgraph selection and one LLM generation
+subgraph_flights = SingleFlight()
+generation_flights = SingleFlight()
+
+# GRAPH LOADING
+# Courses (graph + GraphRAG working dir + vector DB) are loaded on first use and reused;
+# a course is reloaded when its graph file changes and evicted LRU under COURSE_MEMORY_MB.
+# The default course is the graph configured above; more come from data/courses.json.
+# With the sqlite backend only a GraphStore handle is cached, the graph stays on disk.
+courses = load_registry(Course(DEFAULT_COURSE, GRAPH_SOURCE, WORKING_DIR, vector_store.DB_PATH),
+                        rank_context=CONTEXT_RANKING == "pagerank")
+
+def load_course(course_id=None):
+    """
+    Loaded data (graph, concept index, ranker, reports, chunks) of a course. KeyError if unknown.
+    Resolved once per request: the request keeps using it even if the course is evicted meanwhile.
+    """
+    return courses.get(course_id)
 
 # NODE MAPPING (Query -> Entry Point) 
-def find_concept_node(graph, query):
+def find_concept_node(index, query):
     """
     Maps a user query to a specific node in the graph using keyword matching.
     Rationale: In a specialized educational graph, node names (Concepts) 
     are usually distinct technical terms. Keyword matching is precise and low-latency.
+    Misspelled words are corrected against the node-name vocabulary first
+    (see concept_index.py), so "logistic regresion" still finds its node.
     """
-    
-    print(" -- Finding concept node -- ")
-    query_upper = query.upper() # Makes query capital
-    best_match = None
-    best_score = 0
-
-    for node in graph.nodes():
-        
-        # Gets rid of the quotes around the node
-        node_clean = str(node).upper().replace('"', '').replace("'", "").strip()
-        
-        # Simple Jaccard/Overlap matching
-        if node_clean in query_upper or query_upper in node_clean:
-            score = len(node) # Prefer longer, more specific matches
-            if score > best_score:
-                best_score = score
-                best_match = node
-    
-    print(f"Here is the best match Node: {best_match}")
+    best_match = index.lookup(query)
+    logger.debug("Best match node: %s", best_match)
     return best_match
 
-#  SUBGRAPH SELECTION (The Core Logic) 
-def get_pedagogical_subgraph(graph, target_node):
+# CONTEXT BUILDER 
+def rank_context_nodes(graph, nodes, target, context_nodes):
     """
-    Selects a subgraph centered on the target node but explicitly 
-    prioritizes educational edges.
-    
-    Rationale:
-    - We traverse 'prereq_of' backwards to build a scaffolding chain.
-    - We grab 'near_transfer' for breadth testing.
-    - We strictly collect resources attached to these specific concepts.
+    Orders candidate nodes by relevance to the target:
+    closer nodes (fewer hops inside the context subgraph) first, then stronger edges (higher 'weight').
+    When context_nodes maps nodes to PageRank scores (context_ranker.py), higher scores come first.
     """
-    context_nodes = {target_node}
-    
-    # Helper to handle MultiDiGraph vs DiGraph edge data
-    def get_edge_data(u, v):
-        if graph.is_multigraph():
-            return graph[u][v].values() # List of edge dicts
-        return [graph[u][v]] # List containing single edge dict
-    
-    def get_relationship_from_edge(attrs):
-        # First, try the obvious key
-        if "relationship_type" in attrs:
-            return attrs["relationship_type"].upper()
-        
-        # Fallback: Scan ALL values in the edge dictionary
-        # We look for our known keywords.
-        valid_types = {"PREREQUISITE", "COMPONENT", "ANALOGY", "EVIDENCE"}
-        for value in attrs.values():
-            if isinstance(value, str) and value.upper() in valid_types:
-                return value.upper()
-        
-        return "UNKNOWN"
+    if isinstance(context_nodes, dict):
+        return sorted(nodes, key=lambda n: -context_nodes.get(n, 0.0))
 
-    
-    # Scaffolding (Find Prerequisites)
-    # Walk backwards: Who is a prereq of the target?
-    prereqs = []
-    visited_parents = {target_node}
-    stack = [target_node]
-    found_prereqs_temp = []
-
-    while stack:
-        current = stack.pop()
-        print(f"Current node in prereq search is {current}")
-
-        # FIX: Use neighbors() because your graph is undirected
-        try:
-            for parent in graph.neighbors(current):
-                
-                if parent in visited_parents:
-                    continue
-
-                edges = get_edge_data(parent, current)
-                is_valid_parent = False
-                
-                print(f"Checking {current} <-> {parent}") # Uncomment to see it working
-
-                for attrs in edges:
-                    rtype = get_relationship_from_edge(attrs)
-                    print(rtype)
-                    
-                    # LOGIC:
-                    # Even though the graph is undirected, we treat the relationship semantically.
-                    # If the edge is "PREREQUISITE" or "COMPONENT", we accept it as a parent node.
-                    if rtype in ["PREREQUISITE", "COMPONENT"]:
-                        is_valid_parent = True
-                        break
-                
-                if is_valid_parent:
-                    print(f"  -> Found Prereq: {parent}")
-                    visited_parents.add(parent)
-                    found_prereqs_temp.append(parent)
-                    context_nodes.add(parent)
-                    stack.append(parent) 
-                    
-        except Exception as e:
-             print(f"Error on node {current}: {e}") 
-             continue
-    
-    # Reverse list so the most fundamental concept comes first (Root -> Leaf)
-    prereqs = found_prereqs_temp[::-1]
-
-    # B. Near Transfer (Siblings)
-    # Check Outgoing Analogies (Target -> Sibling)
-    siblings = []
-    for neighbor in graph.neighbors(target_node):
-        if neighbor in context_nodes: 
-            continue
-            
-        for attrs in get_edge_data(target_node, neighbor):
-            if get_relationship_from_edge(attrs) == "ANALOGY":
-                siblings.append(neighbor)
-                context_nodes.add(neighbor)
-                break
-
-    # C. Resources & Examples (Evidence)
-    current_context = list(context_nodes) # Snapshot to avoid 'Set changed size' error
-    evidence = []
-    for node in current_context:
-        try:
-            # FIX: Use neighbors() instead of successors()
-            for neighbor in graph.neighbors(node):
-                
-                # specific check to avoid cycles or duplicates
-                if neighbor in context_nodes: 
-                    continue
-                
-                # Get edge data for NODE <-> NEIGHBOR
-                edges = get_edge_data(node, neighbor)
-                is_evidence = False
-                
-                for attrs in edges:
-                    # Use your robust helper function
-                    rtype = get_relationship_from_edge(attrs)
-                    
-                    # 1. Strict Check: Is the relationship labeled EVIDENCE?
-                    if rtype == "EVIDENCE":
-                        is_evidence = True
-                    
-                    # 2. Heuristic Check: Does the node name look like a chunk?
-                    # (Useful if the edge label is missing/wrong)
-                    elif "chunk" in str(neighbor).lower():
-                        is_evidence = True
-                        
-                    if is_evidence: 
-                        break # Stop checking other edges if one confirms it
-                        
-                if is_evidence:
-                    evidence.append(neighbor)
-                    context_nodes.add(neighbor)
-                    
-        except Exception:
-            continue
-        
-    print(context_nodes)
-    print(prereqs)
-    print(siblings)
-    print(evidence)
+    subgraph = graph.subgraph(set(context_nodes) | {target})
+    distances = nx.single_source_shortest_path_length(subgraph, target)
 
-    return context_nodes, prereqs, siblings, evidence
+    def strongest_edge(node):
+        weights = [float(attrs.get("weight", 0) or 0)
+                   for _, _, attrs in subgraph.edges(node, data=True)]
+        return max(weights, default=0.0)
 
-# CONTEXT BUILDER 
-def format_context(graph, context_nodes, prereqs, target):
+    return sorted(nodes, key=lambda n: (distances.get(n, len(subgraph)), -strongest_edge(n)))
+
+def format_context(graph, context_nodes, prereqs, target, max_tokens=MAX_CONTEXT_TOKENS, known_nodes=()):
     """
     Formats the subgraph into a prompt, ordering from Simple -> Complex.
+    Items are packed into the token budget in priority order:
+    target first, then prerequisites, then resources/examples (each ranked by
+    path distance and edge weight). Nodes in known_nodes were already sent
+    earlier in the conversation and are skipped.
+    Returns (context_str, dropped_count, packed_nodes).
     """
+    known_nodes = set(known_nodes)
+    prereqs = [n for n in prereqs if n not in known_nodes]
+    resources = [n for n in context_nodes if n not in prereqs and n != target and n not in known_nodes]
+
+    # The target definition is always included, unless the conversation already has it
+    if target in known_nodes:
+        target_entry = "Definition: (given earlier in this conversation)\n"
+    else:
+        desc = graph.nodes[target].get("description", "No definition")
+        target_entry = f"Definition: {desc}\n"
+    used = count_tokens(target_entry)
+
+    def pack(nodes, template, default):
+        nonlocal used
+        packed = []
+        for node in rank_context_nodes(graph, nodes, target, context_nodes):
+            entry = template.format(node=node, desc=graph.nodes[node].get("description", default))
+            cost = count_tokens(entry)
+            if used + cost > max_tokens:
+                continue # Skip it, a smaller item further down may still fit
+            used += cost
+            packed.append((node, entry))
+        return packed
+
+    packed_prereqs = dict(pack(prereqs, "Concept: {node}\nDetails: {desc}\n", "No definition"))
+    packed_resources = pack(resources, "Item: {node}\nInfo: {desc}", "")
+    dropped = len(prereqs) + len(resources) - len(packed_prereqs) - len(packed_resources)
+
     lines = []
-    
-    # Prerequisites (Scaffolding) first
-    if prereqs:
+
+    # Prerequisites (Scaffolding) first, keeping the Root -> Leaf order
+    if packed_prereqs:
         lines.append(f"--- PREREQUISITE CONCEPTS (Scaffolding for {target}) ---")
         for node in prereqs:
-            desc = graph.nodes[node].get("description", "No definition")
-            lines.append(f"Concept: {node}\nDetails: {desc}\n")
+            if node in packed_prereqs:
+                lines.append(packed_prereqs[node])
 
     # The Main Concept
     lines.append(f"--- TARGET CONCEPT: {target} ---")
-    desc = graph.nodes[target].get("description", "No definition")
-    lines.append(f"Definition: {desc}\n")
+    lines.append(target_entry)
 
     # Resources/Examples
     lines.append("--- RESOURCES & EXAMPLES ---")
-    for node in context_nodes:
-        if node not in prereqs and node != target:
-            data = graph.nodes[node]
-            lines.append(f"Item: {node}\nInfo: {data.get('description', '')}")
+    for _, entry in packed_resources:
+        lines.append(entry)
+
+    # The target only counts as sent when this turn carries its definition, not the placeholder
+    packed_nodes = [] if target in known_nodes else [target]
+    packed_nodes += list(packed_prereqs) + [node for node, _ in packed_resources]
+    return "\n".join(lines), dropped, packed_nodes
+
+def select_subgraph(G, target_node, ranker=None):
+    """
+    Dispatches to the indexed graph store queries, the course's PageRank ranker
+    (built only with CONTEXT_RANKING=pagerank) or the in-memory traversal.
+    """
+    if isinstance(G, GraphStore):
+        return G.get_pedagogical_subgraph(target_node)
+    if ranker is not None:
+        return ranker.get_pedagogical_subgraph(target_node)
+    return get_pedagogical_subgraph(G, target_node)
+
+# HYBRID RETRIEVAL
+def select_graph_subgraph(course, query):
+    """Concept match + subgraph selection, timed as one unit of graph work."""
+    G = course.graph
+    timings = {}
+    start = time.perf_counter()
+    target_node = find_concept_node(course.index, query)
+    timings["concept_match"] = time.perf_counter() - start
+
+    if not target_node:
+        return None, None, timings
+
+    start = time.perf_counter()
+    # Keyed on the graph object too: the same concept name can exist in several courses
+    subgraph, shared = subgraph_flights.do((id(G), target_node), lambda: select_subgraph(G, target_node, course.ranker))
+    if shared:
+        COALESCED_TOTAL.inc(stage="subgraph_select")
+    timings["subgraph_select"] = time.perf_counter() - start
+    return target_node, subgraph, timings
+
+def fetch_vector_chunks(query, db_path=vector_store.DB_PATH, course_id=None, source=None):
+    """
+    sqlite-vec top-k search within the course's partition (optionally one source URL).
+    A missing or broken vector DB only disables this path.
+    """
+    start = time.perf_counter()
+    if not os.path.exists(db_path):
+        # Checked before get_top_chunks embeds the question: no API call for a course without one
+        logger.debug("No vector database at %s, skipping vector retrieval", db_path)
+        return [], time.perf_counter() - start
+    try:
+        rows = vector_store.get_top_chunks(query, top_k=VECTOR_TOP_K, db_path=db_path,
+                                           course_id=course_id, source=source)
+    except Exception as e:
+        logger.warning("Vector retrieval failed: %s", e)
+        rows = []
+    return rows, time.perf_counter() - start
+
+def graph_chunk_ids(graph, nodes):
+    """
+    Chunk IDs referenced by the given nodes (their 'source_id' attribute, or the node
+    itself when it is a chunk), most frequently referenced first.
+    """
+    counts = Counter()
+    for node in nodes:
+        node_id = str(node).strip('"')
+        if node_id.startswith("chunk-"):
+            counts[node_id] += 1
+        for chunk_id in str(graph.nodes[node].get("source_id", "")).split("<SEP>"):
+            if chunk_id.strip():
+                counts[chunk_id.strip()] += 1
+    return [chunk_id for chunk_id, _ in counts.most_common()]
 
+def _word_set(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+def merge_passages(graph_passages, vector_passages, max_tokens=MAX_PASSAGE_TOKENS, known_passages=()):
+    """
+    Merges graph evidence chunks and vector hits into one deduplicated list of
+    (label, text) passages within the token budget. Graph passages come first,
+    vector hits that overlap an already kept passage are dropped, and so are
+    passages whose label is in known_passages (already sent in the conversation).
+    """
+    kept = []
+    kept_words = []
+    used = 0
+    for label, text in graph_passages + vector_passages:
+        words = _word_set(text)
+        if not words or label in known_passages:
+            continue
+        is_duplicate = any(
+            len(words & other) / min(len(words), len(other)) >= DUPLICATE_OVERLAP
+            for other in kept_words
+        )
+        if is_duplicate:
+            continue
+        cost = count_tokens(text)
+        if used + cost > max_tokens:
+            continue
+        used += cost
+        kept.append((label, text))
+        kept_words.append(words)
+    return kept
+
+def format_passages(passages, sources=None):
+    """sources maps a passage label to the page URL shown for it (vector hits)."""
+    sources = sources or {}
+    lines = ["--- SOURCE PASSAGES ---"]
+    for label, text in passages:
+        lines.append(f"Source: {sources.get(label, label)}\n{text}\n")
     return "\n".join(lines)
 
+def select_community_context(reports, query, target_node):
+    """
+    Questions naming no concept, or broad questions about a whole cluster's topic, are
+    served from the community summaries; a broad question about a single concept keeps
+    its subgraph. Returns (community context, target node), the node being None when
+    the overviews replace the single-concept subgraph.
+    """
+    if target_node and not (is_broad_question(query) and is_cluster_title(reports, target_node)):
+        return "", target_node
+    selected = select_reports(reports, query, COMMUNITY_CONTEXT_TOKENS)
+    if not selected:
+        return "", target_node
+    logger.info("Answering from %d community reports", len(selected))
+    return format_reports(selected), None
+
+
+def build_graph_context(G, target_node, subgraph, text_chunks, known_nodes=(), max_tokens=MAX_CONTEXT_TOKENS):
+    """
+    Graph half of the prompt for one target concept: the packed subgraph and the
+    evidence chunk texts (read from the course's chunk source). Without
+    known_nodes it depends only on the target, so questions about the same
+    concept can share it.
+    Returns (context_str, graph_passages, packed_nodes).
+    """
+    all_nodes, prereqs, siblings, evidence = subgraph
+    if isinstance(G, GraphStore):
+        # Only the selected nodes are read from disk
+        G = G.subgraph(all_nodes)
+    logger.info("Selected Subgraph for %s: %d nodes (%d prereqs, %d siblings, %d evidence)",
+                target_node, len(all_nodes), len(prereqs), len(siblings), len(evidence))
+
+    context_str, dropped, packed_nodes = format_context(G, all_nodes, prereqs, target_node,
+                                                        max_tokens=max_tokens, known_nodes=known_nodes)
+    CONTEXT_DROPPED_TOTAL.inc(dropped)
+    logger.info("Context packed into %d tokens, dropped %d items", max_tokens, dropped)
+
+    # Resolve the evidence chunk IDs of the target and its evidence nodes to text
+    graph_passages = text_chunks.get_texts(graph_chunk_ids(G, [target_node] + evidence), limit=MAX_GRAPH_CHUNKS)
+    return context_str, graph_passages, packed_nodes
+
+def build_prompt_context(graph_context, graph_passages, vector_rows, known_passages=()):
+    """
+    Joins the graph context with the merged graph + vector passages.
+    Vector passages are labelled by row ID (vec-<id>), so other chunks of an
+    already sent page stay eligible; their URL is only shown in the prompt.
+    Returns (context_str, passage_labels).
+    """
+    sections = [graph_context] if graph_context else []
+    vector_passages = [(f"vec-{row_id}", text) for row_id, _, text, _ in vector_rows]
+    sources = {f"vec-{row_id}": source for row_id, source, _, _ in vector_rows}
+    passages = merge_passages(graph_passages, vector_passages, known_passages=known_passages)
+    if passages:
+        sections.append(format_passages(passages, sources))
+    context_str = "\n\n".join(sections)
+    TOKENS_TOTAL.inc(count_tokens(context_str), kind="context")
+    return context_str, [label for label, _ in passages]
+
 # GENERATION 
-def generate_tutor_response(query, context_str):
-    prompt = f"""
-    You are Erica, an expert AI Tutor.
-    
-    USER QUERY: "{query}"
-    
-    Use the Knowledge Graph context below to answer.
-    
-     PEDAGOGICAL INSTRUCTIONS:
-    1. Start by briefly reviewing the PREREQUISITE CONCEPTS to scaffold the learning.
-    2. Then, explain the TARGET CONCEPT in depth.
-    3. Use the provided RESOURCES/EXAMPLES to illustrate.
-    4. Finally, mention related concepts (Near Transfer) to broaden understanding.
-    
-    CONTEXT SUBGRAPH:
-    {context_str}
+# Static instructions come first and never change, so the provider can cache the prompt prefix
+SYSTEM_PROMPT = """You are Erica, an expert AI Tutor.
+
+Use the Knowledge Graph context given with each question to answer.
+
+PEDAGOGICAL INSTRUCTIONS:
+1. Start by briefly reviewing the PREREQUISITE CONCEPTS to scaffold the learning.
+2. Then, explain the TARGET CONCEPT in depth.
+3. Use the provided RESOURCES/EXAMPLES and SOURCE PASSAGES to illustrate.
+4. Finally, mention related concepts (Near Transfer) to broaden understanding.
+
+In a follow-up question, context sent in earlier turns still applies and is not repeated."""
+
+def build_user_message(query, context_str):
+    """Context before the question: only the question changes between similar requests."""
+    return {"role": "user", "content": f"CONTEXT SUBGRAPH:\n{context_str}\n\nUSER QUERY: \"{query}\""}
+
+def generate_tutor_response(query, context_str, trace=None, history=()):
     """
-    
-    response = client.chat.completions.create(
+    Generates the answer. history holds earlier turns of a session (user and
+    assistant messages), placed between the instructions and the new question.
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(history)
+    messages.append(build_user_message(query, context_str))
+
+    # Streamed so time-to-first-token can be measured; usage arrives in the last chunk
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+
+    stream = client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True}
     )
-    return response.choices[0].message.content
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(chunk.choices[0].delta.content)
+
+    finished = time.perf_counter()
+    if trace is not None:
+        trace.record("llm_first_token", (first_token_at or finished) - started)
+        trace.record("llm_total", finished - started)
+
+    if usage is not None:
+        TOKENS_TOTAL.inc(usage.prompt_tokens, kind="prompt")
+        TOKENS_TOTAL.inc(usage.completion_tokens, kind="completion")
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        TOKENS_TOTAL.inc(cached, kind="cached_prompt")
+        CACHE_TOTAL.inc(cache="llm_prompt", result="hit" if cached else "miss")
+
+    return "".join(parts)
+
+def _digest(*parts):
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+def generate_coalesced(query, context_str, target_node, trace=None):
+    """
+    generate_tutor_response for requests without session history, shared with
+    identical requests already in flight. The key is (target node, context hash,
+    prompt variant); the variant covers the instructions and the normalized
+    question, since the answer depends on both.
+    """
+    variant = _digest(SYSTEM_PROMPT, " ".join(re.findall(r"[a-z0-9]+", query.lower())))
+    key = (target_node, _digest(context_str), variant)
+
+    start = time.perf_counter()
+    answer, shared = generation_flights.do(key, lambda: generate_tutor_response(query, context_str, trace))
+    if shared:
+        COALESCED_TOTAL.inc(stage="generation")
+        if trace is not None:
+            trace.record("coalesced_wait", time.perf_counter() - start)
+    return answer
 
 # EXECUTION FLOW 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 @app.route("/ask", methods=["POST"])
 def user_input_flow():
-    print(" Loading Knowledge Graph...")
-    if not os.path.exists(GRAPH_PATH):
-        print(f" Error: Graph not found at {GRAPH_PATH}. Run build script first.")
-        exit()
-        
-    G = nx.read_graphml(GRAPH_PATH)
-    print(f" Loaded {G.number_of_nodes()} concepts.")
+    trace = RequestTrace("/ask")
 
-    
     data = request.get_json()
     if not data or "question" not in data:
+        trace.finish(400)
         return jsonify({"error": "Missing 'question' in request body"}), 400
 
+    # Optional course ID: each course has its own graph, reports and vector DB
+    course_id = str(data["course_id"]) if data.get("course_id") else None
+    if course_id is not None and course_id not in courses:
+        trace.finish(404)
+        return jsonify({"error": f"Unknown course '{course_id}'"}), 404
+
+    try:
+        with trace.span("graph_load"):
+            course = load_course(course_id)
+    except FileNotFoundError as e:
+        logger.error("%s. Run build script first.", e)
+        trace.finish(500)
+        return "Knowledge Graph is not available.", 500, {"Content-Type": "text/plain; charset=utf-8"}
+    G = course.graph
+
     user_query = data["question"]
-    
-    print(f"\n User Query: {user_query}")
+    logger.info("User Query (%s): %s", course.course_id, user_query)
 
-    # Map to Node
-    target_node = find_concept_node(G, user_query)
-    
-    if target_node:
-        print(f" Mapped to Graph Node: {target_node}")
-        
-        # Select Subgraph
-        all_nodes, prereqs, siblings, evidence = get_pedagogical_subgraph(G, target_node)
-        print(f" Selected Subgraph: {len(all_nodes)} nodes")
-        print(f"   - Prerequisites: {prereqs}")
-        print(f"   - Siblings: {siblings}")
-        print(f"   - Evidence: {len(evidence)} items")
-        
-        # Generate
-        context_str = format_context(G, all_nodes, prereqs, target_node)
-        answer = generate_tutor_response(user_query, context_str)
-        
-        print("\n Ericas's Answer:\n")
-        print(answer)
-        return markdown(answer), 200, {"Content-Type": "text/plain; charset=utf-8"}
-    else:
-        print(" Concept not found in Knowledge Graph.")
+    # Graph path (concept match + subgraph) and vector path run concurrently
+    graph_future = retrieval_pool.submit(select_graph_subgraph, course, user_query)
+    # An optional 'source' (lecture URL) narrows the vector search to that page's chunks
+    vector_future = retrieval_pool.submit(fetch_vector_chunks, user_query, course.vector_db,
+                                          course.course_id, data.get("source"))
+    target_node, subgraph, graph_timings = graph_future.result()
+    vector_rows, vector_seconds = vector_future.result()
+    for stage, seconds in graph_timings.items():
+        trace.record(stage, seconds)
+    trace.record("vector_search", vector_seconds)
+
+    with trace.span("community_select"):
+        community_context, target_node = select_community_context(course.reports, user_query, target_node)
+
+    if not target_node and not vector_rows and not community_context:
+        logger.info("Concept not found in Knowledge Graph and no vector matches.")
+        trace.finish(404)
         return "Concept not found in Knowledge Graph.", 404, {"Content-Type": "text/plain; charset=utf-8"}
+
+    # Optional conversation session: follow-ups only send context the session has not seen
+    session_id = data.get("session_id")
+    session = sessions.get(str(session_id)) if session_id else None
+    headers = {"Content-Type": "text/plain; charset=utf-8"}
+    if session is not None:
+        headers["X-Session-Id"] = session.session_id
+        session.lock.acquire() # One turn at a time per session
+
+    try:
+        known_nodes = session.known_nodes() if session else ()
+        known_passages = session.known_passages() if session else ()
+        history = session.history() if session else []
+        context_budget = FOLLOWUP_CONTEXT_TOKENS if history else MAX_CONTEXT_TOKENS
+
+        with trace.span("prompt_build"):
+            graph_context, graph_passages, packed_nodes = community_context, [], []
+            if target_node:
+                logger.info("Mapped to Graph Node: %s", target_node)
+                graph_context, graph_passages, packed_nodes = build_graph_context(
+                    G, target_node, subgraph, course.text_chunks,
+                    known_nodes=known_nodes, max_tokens=context_budget)
+            elif not community_context:
+                logger.info("Concept not found in Knowledge Graph, answering from vector matches.")
+            context_str, passage_labels = build_prompt_context(
+                graph_context, graph_passages, vector_rows, known_passages=known_passages)
+
+        if history:
+            answer = generate_tutor_response(user_query, context_str, trace, history=history)
+        else:
+            answer = generate_coalesced(user_query, context_str, target_node, trace)
+        logger.debug("Erica's Answer:\n%s", answer)
+
+        if session is not None:
+            turn = [build_user_message(user_query, context_str), {"role": "assistant", "content": answer}]
+            tokens = sum(count_tokens(m["content"]) for m in turn)
+            session.add_turn(turn, packed_nodes, passage_labels, tokens)
+    finally:
+        if session is not None:
+            session.lock.release()
+
+    with trace.span("markdown_render"):
+        html = markdown(answer)
+    trace.finish(200)
+    return html, 200, headers
+
+@app.route("/ask/batch", methods=["POST"])
+def batch_flow():
+    """
+    Answers many questions in one call (e.g. a whole problem set).
+    All target concepts are resolved first and each distinct pedagogical
+    subgraph is built once; generations then run concurrently, capped at
+    BATCH_CONCURRENCY. Results are streamed as NDJSON in input order, each
+    line sent as soon as it and every earlier question are done.
+    """
+    trace = RequestTrace("/ask/batch")
+
+    data = request.get_json()
+    questions = data.get("questions") if data else None
+    if not isinstance(questions, list) or not questions:
+        trace.finish(400)
+        return jsonify({"error": "Missing 'questions' list in request body"}), 400
+    if len(questions) > MAX_BATCH_SIZE:
+        trace.finish(400)
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} questions per batch"}), 400
+
+    course_id = str(data["course_id"]) if data.get("course_id") else None
+    if course_id is not None and course_id not in courses:
+        trace.finish(404)
+        return jsonify({"error": f"Unknown course '{course_id}'"}), 404
+
+    try:
+        with trace.span("graph_load"):
+            course = load_course(course_id)
+    except FileNotFoundError as e:
+        logger.error("%s. Run build script first.", e)
+        trace.finish(500)
+        return jsonify({"error": "Knowledge Graph is not available."}), 500
+    G = course.graph
+
+    # 1. Resolve every question to its target node, or to community reports as /ask does
+    with trace.span("concept_match"):
+        targets = [find_concept_node(course.index, str(question)) for question in questions]
+    with trace.span("community_select"):
+        community = [select_community_context(course.reports, str(question), target_node)
+                     for question, target_node in zip(questions, targets)]
+        community_contexts = [context for context, _ in community]
+        targets = [target_node for _, target_node in community]
+
+    # 2. Build each distinct subgraph + graph context only once
+    with trace.span("subgraph_select"):
+        graph_contexts = {}
+        for target_node in set(targets) - {None}:
+            subgraph = select_subgraph(G, target_node, course.ranker)
+            graph_contexts[target_node] = build_graph_context(G, target_node, subgraph, course.text_chunks)[:2]
+    logger.info("Batch of %d questions -> %d distinct concepts", len(questions), len(graph_contexts))
+
+    # 3. Per-question work: vector search, prompt, generation
+    def answer_one(index, question, target_node, community_context):
+        result = {"index": index, "question": question, "concept": target_node}
+        try:
+            vector_rows, _ = fetch_vector_chunks(str(question), course.vector_db, course.course_id)
+            if not target_node and not vector_rows and not community_context:
+                result.update(status=404, error="Concept not found in Knowledge Graph.")
+                return result
+
+            graph_context, graph_passages = graph_contexts.get(target_node, (community_context, []))
+            context_str, _ = build_prompt_context(graph_context, graph_passages, vector_rows)
+            answer = generate_coalesced(str(question), context_str, target_node)
+            result.update(status=200, answer=markdown(answer))
+        except Exception as e:
+            logger.exception("Batch question %d failed", index)
+            result.update(status=500, error=str(e))
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
+    futures = [pool.submit(answer_one, i, q, t, c)
+               for i, (q, t, c) in enumerate(zip(questions, targets, community_contexts))]
+
+    def stream_results():
+        try:
+            for future in futures:
+                yield json.dumps(future.result()) + "\n"
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            trace.finish(200)
+
+    return Response(stream_results(), mimetype="application/x-ndjson")
     
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Load the busiest courses before the first request; remember this run's activity for the next start
+    courses.preload()
+    atexit.register(courses.save_activity)
+    app.run(debug=True, port=int(os.getenv("PORT", 5000)))
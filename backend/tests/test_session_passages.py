@@ -0,0 +1,33 @@
+import os
+import sys
+
+# The server scripts are flat modules; the OpenAI client is created at import but never called here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sessions import Session
+from userinput import build_prompt_context
+
+LECTURE = "http://lec/1"
+FIRST = "Gradient descent updates the parameters in the direction of the negative gradient."
+SECOND = "The learning rate controls how large each step of the optimizer is."
+
+
+def test_second_chunk_of_a_sent_page_is_sent_in_a_follow_up():
+    session = Session("s1")
+
+    context, labels = build_prompt_context("", [], [(1, LECTURE, FIRST, 0.1)])
+    assert labels == ["vec-1"]
+    assert f"Source: {LECTURE}" in context
+    session.add_turn([], [], labels, tokens=10)
+
+    # Same page, different chunk: only the chunk already sent is blocked
+    context, labels = build_prompt_context("", [], [(1, LECTURE, FIRST, 0.1), (2, LECTURE, SECOND, 0.2)],
+                                           known_passages=session.known_passages())
+    assert labels == ["vec-2"]
+    assert SECOND in context and FIRST not in context
+
+
+def test_two_chunks_of_one_page_get_distinct_labels():
+    _, labels = build_prompt_context("", [], [(1, LECTURE, FIRST, 0.1), (2, LECTURE, SECOND, 0.2)])
+    assert labels == ["vec-1", "vec-2"]
@@ -78,6 +78,8 @@ export default function App() {
     }
   ]);
   const [isTyping, setIsTyping] = useState(false);
+  // Conversation session on the backend, so follow-up questions reuse earlier context
+  const [sessionId, setSessionId] = useState(() => crypto.randomUUID());
   const scrollRef = useRef<HTMLDivElement>(null);
 
   // Auto-scroll to bottom
@@ -105,7 +107,7 @@ export default function App() {
     try {
       const response = await axios.post(
         "http://localhost:5000/ask",
-        { question: currentQuestion }, 
+        { question: currentQuestion, session_id: sessionId }, 
         { responseType: "text" }
       );
 
@@ -144,6 +146,7 @@ export default function App() {
 
   const clearChat = () => {
       setMessages([messages[0]]); // Keep welcome message
+      setSessionId(crypto.randomUUID()); // Start a fresh conversation on the backend
   };
 
   return (